@@ -162,9 +162,8 @@ for pkg in ["punkt", "wordnet", "omw-1.4", "averaged_perceptron_tagger", "averag
 # -----------------------------
 # Now safe to import modules
 # -----------------------------
-from nltk.metrics import edit_distance
 import pickle
-from corrections import detect_errors, display_tokens, FUNCTION_WORDS
+from corrections import detect_errors, display_tokens, analyze_user_input, MODELS, FUNCTION_WORDS
 
 
 # -----------------------------
@@ -188,6 +187,57 @@ def load_vocab():
 
 word_freq, vocab = load_vocab()
 
+@st.cache_resource
+def vocab_listing():
+    """Sorted vocabulary as one string, built once per server process"""
+    return "\n".join(sorted(vocab))
+
+# -----------------------------
+# Check results (cached per input text and model version)
+# -----------------------------
+@st.cache_data(max_entries=256, show_spinner=False)
+def check_text(text, model_version):
+    """
+    Analyse text once and return everything the page renders:
+        words: [{'text', 'style' (spelling/grammar/None), 'type', 'suggestions'}]
+        has_errors: whether any spelling error was found
+    Suggestions are (word, edit distance) pairs sorted by edit distance.
+    model_version is part of the cache key, so a model reload invalidates results.
+    """
+    analysis = analyze_user_input(text)
+
+    # Grammar-aware display tokens + indices
+    display_version, grammar_indices, grammar_map = display_tokens(analysis)
+    grammar_indices = set(grammar_indices)
+
+    # Detect spelling errors
+    errors = detect_errors(analysis)
+
+    # word → first error type / suggestions sorted by edit distance (distances come with the records)
+    error_types = {}
+    suggestion_map = {}
+    for err in errors:
+        lw = err['word'].lower()
+        error_types.setdefault(lw, err['type'])
+        suggestion_map[lw] = sorted(zip(err['suggestions'], err['distances']), key=lambda s: s[1])
+
+    words = []
+    for i, word in enumerate(display_version):
+        lw = word.lower()
+        style = None
+        if lw in suggestion_map and lw not in FUNCTION_WORDS:
+            style = "spelling"
+        elif i in grammar_indices:
+            style = "grammar"
+        flagged = lw in suggestion_map or i in grammar_indices
+        words.append({
+            'text': word,
+            'style': style,
+            'type': error_types.get(lw, "grammar") if flagged else None,
+            'suggestions': suggestion_map.get(lw, []),
+        })
+    return {'words': words, 'has_errors': bool(errors)}
+
 # -----------------------------
 # UI Header
 # -----------------------------
@@ -215,53 +265,23 @@ user_input = st.text_area(
 # -----------------------------
 if st.button("🔍 Check Text", use_container_width=True):
 
-    # -----------------------------
-    # Ensure NLTK resources are available at runtime
-    # -----------------------------
-    import nltk
-    for pkg, path in [
-        ("punkt", "tokenizers/punkt"),
-        ("averaged_perceptron_tagger", "taggers/averaged_perceptron_tagger"),
-        ("wordnet", "corpora/wordnet"),
-        ("omw-1.4", "corpora/omw-1.4")
-    ]:
-        try:
-            nltk.data.find(path)
-        except LookupError:
-            nltk.download(pkg)
-
     # -----------------------------
     # Validate input
     # -----------------------------
     if not user_input.strip():
         st.warning("⚠️ Please enter some text before checking.")
     else:
-        # Grammar-aware display tokens + indices
-        display_version, grammar_indices, grammar_map = display_tokens(user_input)
-
-        # Detect spelling errors
-        errors = detect_errors(user_input)
-        spelling_words = {err['word'].lower() for err in errors}  # red highlights
-
-        # Map word → suggestions sorted by edit distance
-        suggestion_map = {}
-        for err in errors:
-            suggestions = sorted(
-                err.get('suggestions', []),
-                key=lambda w: edit_distance(err['word'], w)
-            )
-            suggestion_map[err['word'].lower()] = suggestions
+        result = check_text(user_input, MODELS.ensure_loaded().version)
 
         # Build highlighted text
         highlighted_text = []
-        for i, word in enumerate(display_version):
-            lw = word.lower()
-            if lw in spelling_words and lw not in FUNCTION_WORDS:
-                highlighted_text.append(f"[**:red[{word}]**](#)")
-            elif i in grammar_indices:
-                highlighted_text.append(f"[**:green[{word}]**](#)")
+        for word in result['words']:
+            if word['style'] == "spelling":
+                highlighted_text.append(f"[**:red[{word['text']}]**](#)")
+            elif word['style'] == "grammar":
+                highlighted_text.append(f"[**:green[{word['text']}]**](#)")
             else:
-                highlighted_text.append(word)
+                highlighted_text.append(word['text'])
 
         st.subheader("🖍 Highlighted Text")
         st.markdown(" ".join(highlighted_text))
@@ -270,19 +290,15 @@ if st.button("🔍 Check Text", use_container_width=True):
         # Error Details & Suggestions
         # -----------------------------
         st.subheader("📌 Error Details & Suggestions")
-        if not errors:
+        if not result['has_errors']:
             st.success("✅ No spelling errors detected!")
         else:
-            for i, word in enumerate(display_version):
-                lw = word.lower()
-                if lw in spelling_words or i in grammar_indices:
-                    err_type = next((err['type'] for err in errors if err['word'].lower() == lw), "grammar")
-                    suggestions = suggestion_map.get(lw, [])
-                    with st.expander(f"❌ `{word}` — {err_type} error"):
-                        if suggestions:
+            for word in result['words']:
+                if word['type'] is not None:
+                    with st.expander(f"❌ `{word['text']}` — {word['type']} error"):
+                        if word['suggestions']:
                             st.markdown("**Suggested corrections (sorted by edit distance):**")
-                            for s in suggestions:
-                                dist = edit_distance(lw, s)
+                            for s, dist in word['suggestions']:
                                 st.markdown(f"- **{s}** (Edit distance: {dist})")
                         else:
                             st.info("No suggestions available for grammar corrections.")
@@ -303,7 +319,7 @@ if search_word:
 
 # Scrollable vocabulary list
 with st.expander("📜 Vocabulary List (scrollable)"):
-    st.text_area("Vocabulary", value="\n".join(sorted(vocab)), height=200)
+    st.text_area("Vocabulary", value=vocab_listing(), height=200)
 
 # -----------------------------
 # Footer
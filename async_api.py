@@ -0,0 +1,256 @@
+# async_api.py
+"""
+Asyncio front end for detect_errors / display_tokens
+- The synchronous calls tag and search candidates on the calling thread,
+  which blocks an event loop for the whole check; here the work runs in an
+  executor and the coroutine only awaits the result
+- Executor: "thread" (shares the process's models and caches, but Python
+  work still competes with the loop for the GIL), "process" (a process pool
+  whose workers inherit the models loaded before forking, see prefork.py; the
+  loop thread stays free) or any concurrent.futures.Executor you pass in
+- Backpressure: at most max_concurrency calls (per event loop) are in the executor at once;
+  later calls wait for a slot, and once max_pending are waiting new calls
+  fail fast with Overloaded instead of queueing without bound
+- Per-call timeout (covers waiting for a slot and the work itself) and task
+  cancellation: a call that has not started is dropped from the executor; one
+  already running finishes in its worker and keeps its slot until then, so
+  cancelled work never pushes the executor past max_concurrency
+
+Usage:
+    corrector = AsyncCorrector("process", max_workers=4)
+    errors = await corrector.detect_errors(text, timeout=2.0)
+    tokens, grammar_indices, grammar_map = await corrector.display_tokens(text)
+    result = await corrector.check(text)   # both, from one tagging pass
+    corrector.close()
+"""
+
+import asyncio
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from corrections import MODELS, detect_errors, display_tokens, warmup
+from user_preprocess import analyze_user_input
+
+MAX_PENDING = 1000
+_DEFAULT = object()  # "use the corrector's timeout"
+
+class Overloaded(RuntimeError):
+    """Raised when max_pending calls are already waiting for an executor slot"""
+
+# -----------------------------
+# Executor tasks (module level so process pools can pickle them)
+# -----------------------------
+def _init_worker():
+    warmup()
+
+def _check(text):
+    analysis = analyze_user_input(text)  # tag once for both results
+    tokens, grammar_indices, grammar_map = display_tokens(analysis)
+    return {
+        "tokens": tokens,
+        "grammar_indices": grammar_indices,
+        "grammar_map": grammar_map,
+        "errors": detect_errors(analysis),
+    }
+
+# -----------------------------
+# Corrector
+# -----------------------------
+class AsyncCorrector:
+    """Awaitable detect_errors / display_tokens / check over an executor"""
+
+    def __init__(self, executor="thread", max_workers=None, max_concurrency=None,
+                 max_pending=MAX_PENDING, timeout=None):
+        """
+        executor: "thread", "process" or an Executor (left running by close()).
+        max_concurrency defaults to the number of executor workers; timeout
+        (seconds, None for no limit) applies to calls that do not pass their own.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        self._owns_executor = not isinstance(executor, Executor)
+        if executor == "thread":
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix="corrector")
+        elif executor == "process":
+            MODELS.warmup(tagger=False)  # load before forking so workers inherit models and indexes
+            executor = ProcessPoolExecutor(max_workers, initializer=_init_worker)
+        elif self._owns_executor:
+            raise ValueError(f"executor must be 'thread', 'process' or an Executor, got {executor!r}")
+        self.executor = executor
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # asyncio primitives belong to the loop that first waits on them:
+        # one semaphore per running loop (each asyncio.run() gets its own)
+        self._slots = weakref.WeakKeyDictionary()
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def detect_errors(self, text, timeout=_DEFAULT):
+        """detect_errors(text) without blocking the event loop"""
+        return await self._call(detect_errors, text, timeout)
+
+    async def display_tokens(self, text, timeout=_DEFAULT):
+        """display_tokens(text) without blocking the event loop"""
+        return await self._call(display_tokens, text, timeout)
+
+    async def check(self, text, timeout=_DEFAULT):
+        """{'tokens', 'grammar_indices', 'grammar_map', 'errors'} from one tagging pass"""
+        return await self._call(_check, text, timeout)
+
+    async def warmup(self):
+        """Load models and the tagger in the executor (in every worker of a process pool)"""
+        if isinstance(self.executor, ProcessPoolExecutor):
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self.executor, _init_worker)
+                                   for _ in range(self.max_workers)))
+        else:
+            await asyncio.get_running_loop().run_in_executor(self.executor, warmup)
+
+    def stats(self):
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    async def _call(self, fn, text, timeout):
+        if self.waiting >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.waiting} calls already waiting for the corrector")
+        timeout = self.timeout if timeout is _DEFAULT else timeout
+        try:
+            return await asyncio.wait_for(self._run(fn, text), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    def _loop_slots(self, loop):
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    async def _run(self, fn, text):
+        loop = asyncio.get_running_loop()
+        slots = self._loop_slots(loop)
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            future = self.executor.submit(fn, text)
+        except BaseException:
+            slots.release()
+            raise
+        self.running += 1
+        # The slot is returned when the work really ends, not when the caller
+        # stops waiting: cancelling a running call does not stop its worker
+        future.add_done_callback(lambda _: self._release(loop, slots))
+        result = await asyncio.wrap_future(future)
+        self.completed += 1
+        return result
+
+    def _release(self, loop, slots):
+        def release():
+            self.running -= 1
+            slots.release()
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass  # the loop is closed: nobody is waiting for the slot
+
+    def close(self, wait=True):
+        """Shut the executor down (only if this corrector created it)"""
+        if self._owns_executor:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close(wait=False)
+        return False
+
+# -----------------------------
+# Module-level shortcuts (one shared thread-executor corrector)
+# -----------------------------
+_default = None
+
+def default_corrector():
+    global _default
+    if _default is None:
+        _default = AsyncCorrector()
+    return _default
+
+async def detect_errors_async(text, timeout=None):
+    return await default_corrector().detect_errors(text, timeout)
+
+async def display_tokens_async(text, timeout=None):
+    return await default_corrector().display_tokens(text, timeout)
+
+# -----------------------------
+# Event-loop latency under concurrent checks
+# -----------------------------
+async def _measure(run_check, texts, concurrency):
+    """(seconds, worst event-loop lag) for checking texts with `concurrency` tasks"""
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker(interval=0.001):
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lags.append(loop.time() - start - interval)
+
+    async def client(chunk):
+        for text in chunk:
+            await run_check(text)
+
+    tick = asyncio.create_task(ticker())
+    start = asyncio.get_running_loop().time()
+    await asyncio.gather(*(client(texts[i::concurrency]) for i in range(concurrency)))
+    elapsed = asyncio.get_running_loop().time() - start
+    done.set()
+    await tick
+    lags.sort()
+    return elapsed, lags[-1] if lags else 0.0, lags[len(lags) // 2] if lags else 0.0
+
+async def _main(args):
+    from loadgen import load_sentences
+
+    texts = load_sentences(n=args.requests, seed=args.seed)
+    if args.executor == "inline":
+        warmup()
+
+        async def run_check(text):
+            _check(text)  # the synchronous call, for comparison
+    else:
+        corrector = AsyncCorrector(args.executor, args.workers, args.concurrency)
+        await corrector.warmup()
+        run_check = corrector.check
+    elapsed, worst, median = await _measure(run_check, texts, args.concurrency)
+    print(f"{args.executor}: {len(texts)} checks in {elapsed:.2f}s ({len(texts) / elapsed:.0f}/s) | "
+          f"event-loop lag median {median * 1000:.1f} ms, worst {worst * 1000:.1f} ms")
+    if args.executor != "inline":
+        corrector.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Event-loop lag while checking sentences concurrently")
+    parser.add_argument("--executor", default="thread", choices=["inline", "thread", "process"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent check tasks")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(_main(parser.parse_args()))
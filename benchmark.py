@@ -0,0 +1,326 @@
+# benchmark.py
+"""
+Reproducible benchmarks for every stage of the correction pipeline
+- Seeded synthetic workload: vocabulary.txt words with one random edit
+  (deletion, insertion, substitution or transposition), mixed into sentences
+  of correctly spelled words
+- Online stages are timed per call: preprocess_user_input, generate_candidates
+  (each engine, plus the neighbor graph for vocabulary words), rank_candidates,
+  detect_errors, apply_display_grammar
+- Offline stages (clean, tokenize, vocabulary, n-grams, bundle and index
+  builds) are timed per run on fixed slices of the corpus, in memory
+- Result caches are disabled while timing (--warm-cache keeps them), and
+  indexes are loaded before timing starts
+- Reports p50/p95/p99 latency and throughput per stage and writes JSON;
+  --compare prints the change against a baseline (e.g. benchmark_baseline.json)
+  and exits non-zero when a stage's p50 regresses by more than --tolerance,
+  or when a stage measured in this run is skipped in (or missing from) the
+  baseline, so such a stage is never silently left unguarded
+- Stages that need NLTK data which is not installed are recorded as skipped;
+  record the baseline on a machine that has the data
+
+Usage:
+    python benchmark.py -o results.json
+    python benchmark.py --quick --compare benchmark_baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import pickle
+import platform
+import random
+import string
+import sys
+import time
+
+import bktree
+import build_ngrams
+import build_vocab
+import clean
+import corrections
+import dawg
+import model_bundle
+import neighbor_graph
+import symspell
+import tokenize_text
+from user_preprocess import FUNCTION_WORDS, apply_display_grammar, get_tagger, tokenize_user_input
+
+SEED = 0
+BASELINE_PATH = "benchmark_baseline.json"
+ENGINES = ["symspell", "symspell_flat", "bktree", "numpy", "dawg", "scan"]
+ENGINE_SAMPLE = {"bktree": 0.1, "scan": 0.01}  # slow engines get a fraction of the misspellings
+NOISE_MS = 0.01  # p50 changes smaller than this are never reported as regressions
+
+SIZES = {
+    # name: (misspellings, sentences, offline corpus chars, offline repeats)
+    "full": (2000, 500, 1 << 20, 3),
+    "quick": (300, 100, 1 << 17, 1),
+}
+
+# -----------------------------
+# Workload
+# -----------------------------
+def misspell(word, rng):
+    """word with one random edit; never returns word itself"""
+    letters = string.ascii_lowercase
+    while True:
+        op = rng.choice("dist" if len(word) > 1 else "is")
+        i = rng.randrange(len(word))
+        if op == "d":
+            wrong = word[:i] + word[i + 1:]
+        elif op == "i":
+            wrong = word[:i] + rng.choice(letters) + word[i:]
+        elif op == "s":
+            wrong = word[:i] + rng.choice(letters) + word[i + 1:]
+        else:
+            i = min(i, len(word) - 2)
+            wrong = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        if wrong != word:
+            return wrong
+
+def make_workload(vocab, n_misspellings, n_sentences, seed=SEED, error_rate=0.2):
+    """
+    Returns:
+        pairs: [(misspelling, intended word)]
+        words: correctly spelled vocabulary words (the real-word path)
+        sentences: texts of 8-20 words with about error_rate misspelled
+    """
+    rng = random.Random(seed)
+    words = sorted(w for w in vocab if len(w) >= 3 and w.isalpha())
+    pairs = []
+    for _ in range(n_misspellings):
+        word = rng.choice(words)
+        pairs.append((misspell(word, rng), word))
+    sentences = []
+    for _ in range(n_sentences):
+        sentence = []
+        for _ in range(rng.randint(8, 20)):
+            word = rng.choice(words)
+            sentence.append(misspell(word, rng) if rng.random() < error_rate else word)
+        sentences.append(" ".join(sentence))
+    return pairs, [w for _, w in pairs], sentences
+
+# -----------------------------
+# Timing
+# -----------------------------
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def summarize(latencies, items=None):
+    """Latency percentiles (ms) and throughput (items/sec; items defaults to calls)"""
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    items = len(latencies) if items is None else items
+    return {
+        "calls": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": total / len(latencies) * 1000,
+        "throughput": items / total if total > 0 else 0.0,
+    }
+
+def time_calls(fn, inputs):
+    """Per-call latencies of fn over inputs"""
+    latencies = []
+    perf = time.perf_counter
+    for args in inputs:
+        start = perf()
+        fn(*args)
+        latencies.append(perf() - start)
+    return latencies
+
+def time_runs(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def tagger_available():
+    try:
+        get_tagger()
+        tokenize_text.init_worker()
+        tokenize_text.lemmatize("running", True)
+        return True
+    except LookupError:
+        return False
+
+# -----------------------------
+# Stages
+# -----------------------------
+def online_stages(pairs, words, sentences, has_tagger, warm_cache=False):
+    """Time the per-request functions; returns {stage: summary or skip reason}"""
+    results = {}
+    m = corrections.MODELS
+    m.warmup(engines=[e for e in ENGINES if e != "scan"] + ["neighbors"], tagger=False)
+    if not warm_cache:
+        corrections.set_cache_size(0)
+    try:
+        rng = random.Random(SEED)
+        contexts = [rng.choice(words) for _ in pairs]  # previous word for ranking
+
+        use_graph = corrections.USE_NEIGHBOR_GRAPH
+        corrections.USE_NEIGHBOR_GRAPH = False  # time the engines themselves
+        try:
+            for engine in ENGINES:
+                queries = pairs[:max(1, int(len(pairs) * ENGINE_SAMPLE.get(engine, 1)))]
+                results[f"generate_candidates:{engine}"] = summarize(time_calls(
+                    corrections.generate_candidates, [(wrong, 2, engine) for wrong, _ in queries]))
+        finally:
+            corrections.USE_NEIGHBOR_GRAPH = use_graph
+        graph = m.engine("neighbors")
+        results["generate_candidates:neighbors"] = summarize(time_calls(graph.lookup, [(w, 2) for w in words]))
+
+        candidates = [corrections.generate_candidates(wrong) for wrong, _ in pairs]
+        results["rank_candidates"] = summarize(time_calls(
+            corrections.rank_candidates, list(zip(candidates, contexts))))
+
+        token_lists = [tokenize_user_input(s) for s in sentences]
+        n_tokens = sum(len(t) for t in token_lists)
+        results["apply_display_grammar"] = summarize(
+            time_calls(apply_display_grammar, [(t,) for t in token_lists]), n_tokens)
+        results["detect_errors_in_tokens"] = summarize(
+            time_calls(corrections.detect_errors_in_tokens, [(t,) for t in token_lists]), n_tokens)
+
+        if has_tagger:
+            results["preprocess_user_input"] = summarize(
+                time_calls(corrections.preprocess_user_input, [(s,) for s in sentences]), n_tokens)
+            results["detect_errors"] = summarize(
+                time_calls(corrections.detect_errors, [(s,) for s in sentences]), n_tokens)
+        else:
+            for name in ("preprocess_user_input", "detect_errors"):
+                results[name] = {"skipped": "NLTK tagger/WordNet data not installed"}
+    finally:
+        corrections.set_cache_size(corrections.CACHE_SIZE)  # also when a stage fails
+    return results
+
+def offline_stages(corpus_chars, repeats, has_tagger):
+    """Time the build scripts' work on fixed corpus slices, without writing files"""
+    results = {}
+    with open("data2.txt", "r", encoding="utf-8", errors="ignore") as f:
+        raw = f.read(corpus_chars)
+    with open("cleaned.txt", "r", encoding="utf-8") as f:
+        cleaned = f.read(corpus_chars)
+    n_words = len(cleaned.split())
+
+    results["build:clean"] = summarize(
+        time_runs(lambda: clean.clean_stream(io.StringIO(raw), io.StringIO()), repeats), repeats * len(raw))
+    if has_tagger:
+        results["build:tokenize"] = summarize(
+            time_runs(lambda: tokenize_text.process_text(cleaned), repeats), repeats * n_words)
+    else:
+        results["build:tokenize"] = {"skipped": "NLTK tagger/WordNet data not installed"}
+
+    with open("word_freq.pkl", "rb") as f:
+        word_freq = pickle.load(f)
+    results["build:vocabulary"] = summarize(
+        time_runs(lambda: build_vocab.build_vocabulary(word_freq), repeats), repeats * len(word_freq))
+
+    n_tokens = sum(word_freq.values())
+    results["build:ngrams"] = summarize(
+        time_runs(lambda: build_ngrams.count_ngrams(build_ngrams.iter_token_blocks()), repeats),
+        repeats * n_tokens)
+    results["build:bundle"] = summarize(
+        time_runs(lambda: model_bundle.compile_bundle(extra_vocab=FUNCTION_WORDS), repeats))
+
+    vocab = list(corrections.MODELS.ensure_loaded().vocab)
+    results["build:symspell"] = summarize(time_runs(lambda: symspell.SymSpellIndex(vocab), repeats))
+    results["build:bktree"] = summarize(time_runs(lambda: bktree.BKTree(vocab), repeats))
+    results["build:dawg"] = summarize(time_runs(lambda: dawg.DAWG(vocab), repeats))
+    results["build:neighbor_graph"] = summarize(time_runs(lambda: neighbor_graph.NeighborGraph(vocab), 1))
+    return results
+
+def run(size="full", seed=SEED, warm_cache=False, offline=True):
+    n_pairs, n_sentences, corpus_chars, repeats = SIZES[size]
+    vocab = corrections.MODELS.ensure_loaded().vocab
+    pairs, words, sentences = make_workload(vocab, n_pairs, n_sentences, seed)
+    has_tagger = tagger_available()
+
+    stages = online_stages(pairs, words, sentences, has_tagger, warm_cache)
+    if offline:
+        stages.update(offline_stages(corpus_chars, repeats, has_tagger))
+    return {
+        "meta": {
+            "size": size,
+            "seed": seed,
+            "warm_cache": warm_cache,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "vocab_fingerprint": vocab.fingerprint,
+            "misspellings": n_pairs,
+            "sentences": n_sentences,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": stages,
+    }
+
+# -----------------------------
+# Comparison
+# -----------------------------
+def compare(results, baseline, tolerance=0.2):
+    """
+    Print p50 changes against baseline. Returns (stages slower by more than
+    tolerance, stages measured here that the baseline skipped or lacks).
+    """
+    regressions, unguarded = [], []
+    print(f"{'stage':34} {'baseline p50':>13} {'p50':>10} {'change':>8}")
+    for name, stage in results["stages"].items():
+        if "skipped" in stage:
+            continue
+        base = baseline["stages"].get(name)
+        if not base or "skipped" in base:
+            unguarded.append(name)
+            reason = base["skipped"] if base else "not in baseline"
+            print(f"{name:34} {'-':>13} {stage['p50_ms']:8.3f}ms  NO BASELINE ({reason})")
+            continue
+        ratio = stage["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 1.0
+        flag = ""
+        if ratio > 1 + tolerance and stage["p50_ms"] - base["p50_ms"] > NOISE_MS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:34} {base['p50_ms']:11.3f}ms {stage['p50_ms']:8.3f}ms {ratio:7.2f}x{flag}")
+    return regressions, unguarded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the correction pipeline")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file ('-' for stdout)")
+    parser.add_argument("--quick", action="store_true", help="smaller workload")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--warm-cache", action="store_true", help="keep the result caches enabled")
+    parser.add_argument("--no-offline", action="store_true", help="skip the build stages")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, metavar="BASELINE",
+                        help=f"compare with a results file (default {BASELINE_PATH})")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = run("quick" if args.quick else "full", args.seed, args.warm_cache, not args.no_offline)
+    if args.output == "-":
+        if not args.compare:
+            json.dump(results, sys.stdout, indent=2)
+            print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["meta"]["size"] != results["meta"]["size"]:
+            print(f"note: baseline size {baseline['meta']['size']!r}, this run {results['meta']['size']!r}")
+        regressions, unguarded = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed: " + ", ".join(regressions))
+        if unguarded:
+            print(f"{len(unguarded)} stage(s) have no baseline: " + ", ".join(unguarded) +
+                  f"; re-record it with: python benchmark.py -o {args.compare}")
+        if regressions or unguarded:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
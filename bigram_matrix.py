@@ -0,0 +1,113 @@
+# bigram_matrix.py
+"""
+Sparse (CSR) bigram model over word ids, for vectorized candidate scoring
+- Row = previous word id, column = next word id, value = bigram count
+- Built without copying from the model bundle: its bigram keys are already
+  sorted by (id1, id2), i.e. in CSR order, so column ids, counts and
+  frequencies stay uint32 views of the bundle's pages (shared between
+  processes mapping the same file); only the row pointers (n_words + 1
+  ints) are private. Gathered values are widened to int64 at use time
+- Scoring all candidates after one previous word is a single row gather
+  (binary search of the candidate ids in the row) plus array arithmetic
+- Top-k by partial selection (argpartition) instead of a full sort
+"""
+
+import sys
+
+import numpy as np
+
+# -----------------------------
+# Top-k selection
+# -----------------------------
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first. Ties keep input order, so the
+    result equals a stable descending sort truncated to k.
+    """
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if n > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        threshold = scores[part].min()
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+        selected = np.concatenate([above, ties])
+    else:
+        selected = np.arange(n)
+    # Primary key: score descending; secondary: input position
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+# -----------------------------
+# Model
+# -----------------------------
+class BigramMatrix:
+    """CSR bigram counts plus unigram / frequency arrays, all indexed by word id"""
+
+    def __init__(self, bundle, vocab_size):
+        self.word_id = bundle.word_id
+        self.vocab_size = vocab_size
+        self.total_unigrams = bundle.total_unigrams
+
+        # Each uint64 key is (id1 << 32) | id2: view it as uint32 pairs and
+        # take the halves with strides (the bundle is in native byte order)
+        halves = np.frombuffer(bundle.section("bigram_keys"), dtype=np.uint32)
+        low, high = (0, 1) if sys.byteorder == "little" else (1, 0)
+        self.indices = halves[low::2]
+        self.data = np.frombuffer(bundle.section("bigram_counts"), dtype=np.uint32)
+        n_words = bundle.meta["n_words"]
+        self.indptr = np.searchsorted(halves[high::2], np.arange(n_words + 1, dtype=np.uint32))
+
+        self.freq = np.frombuffer(bundle.section("freq"), dtype=np.uint32)
+        if bundle.meta["same_unigrams"]:
+            self.unigram = self.freq
+        else:
+            self.unigram = np.frombuffer(bundle.section("unigram"), dtype=np.uint32)
+
+    def ids(self, words):
+        """Word ids for words (-1 where unknown)"""
+        return np.fromiter((self.word_id(w) for w in words), dtype=np.int64, count=len(words))
+
+    def gather(self, counts, ids):
+        """counts[ids] as int64, 0 where an id is -1 (counts: self.freq or self.unigram)"""
+        return np.where(ids >= 0, counts[np.maximum(ids, 0)].astype(np.int64), 0)
+
+    def bigram_counts(self, prev_id, ids):
+        """count(prev, w) for every id in ids (one CSR row gather)"""
+        if prev_id < 0:
+            return np.zeros(len(ids), dtype=np.int64)
+        start, end = self.indptr[prev_id], self.indptr[prev_id + 1]
+        if start == end:
+            return np.zeros(len(ids), dtype=np.int64)
+        cols = self.indices[start:end].astype(np.int64)  # widen this row only
+        pos = np.minimum(np.searchsorted(cols, ids), len(cols) - 1)
+        hit = cols[pos] == ids
+        return np.where(hit, self.data[start + pos].astype(np.int64), 0)
+
+    def prob_laplace(self, prev_id, ids):
+        """P(w | prev) with add-one smoothing for every id in ids"""
+        count_unigram = int(self.unigram[prev_id]) if prev_id >= 0 else 0
+        return (self.bigram_counts(prev_id, ids) + 1) / (count_unigram + self.vocab_size)
+
+    def scores(self, words, prev_word=None):
+        """frequency / total (+ P(w | prev_word) if given), as rank_candidates computes it"""
+        words = list(words)
+        ids = self.ids(words)
+        freq = self.gather(self.freq, ids)
+        scores = freq / self.total_unigrams
+        if prev_word is not None:
+            lowered = [w.lower() for w in words]
+            if lowered != words:
+                ids = self.ids(lowered)  # bigram lookups are case-insensitive, frequencies are not
+            scores = scores + self.prob_laplace(self.word_id(prev_word), ids)
+        return scores
+
+    def rank(self, words, prev_word=None, k=5):
+        """Top-k words by score, best first (prev_word already lowercased, or None)"""
+        return [w for w, _ in self.rank_scored(words, prev_word, k)]
+
+    def rank_scored(self, words, prev_word=None, k=5):
+        """rank() with each word's score: [(word, score), ...]"""
+        words = list(words)
+        scores = self.scores(words, prev_word)
+        return [(words[i], float(scores[i])) for i in top_k(scores, k)]
@@ -0,0 +1,125 @@
+# bktree.py
+"""
+BK-tree metric index over the vocabulary
+- Each node stores a word and its children keyed by edit distance to that word
+- Search only descends into children whose edge distance k satisfies
+  |k - d(query, node)| <= max_distance (triangle inequality)
+- Stored as flat lists so it pickles quickly and without deep recursion
+"""
+
+import os
+import pickle
+from nltk.metrics.distance import edit_distance
+from symspell import vocab_fingerprint
+
+INDEX_PATH = "bktree_index.pkl"
+
+# -----------------------------
+# Tree
+# -----------------------------
+class BKTree:
+    """BK-tree over a fixed vocabulary (Levenshtein distance)"""
+
+    # Any radius can be searched; kept for interface parity with SymSpellIndex
+    max_distance = float("inf")
+
+    def __init__(self, words):
+        self.fingerprint = vocab_fingerprint(words)
+        self.words = []      # node id -> word
+        self.children = []   # node id -> {distance: child node id}
+        for word in sorted(words):
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        """Insert a word (no-op if it is already present)"""
+        if not self.words:
+            self.words.append(word)
+            self.children.append({})
+            return
+        node = 0
+        while True:
+            d = edit_distance(word, self.words[node])
+            if d == 0:
+                return
+            child = self.children[node].get(d)
+            if child is None:
+                self.children[node][d] = len(self.words)
+                self.words.append(word)
+                self.children.append({})
+                return
+            node = child
+
+    def search(self, word, max_distance=2):
+        """
+        Return (candidates, nodes_visited) for all words within max_distance.
+        nodes_visited counts edit-distance evaluations, comparable to len(VOCAB)
+        for the linear scan.
+        """
+        if not self.words:
+            return [], 0
+        candidates = []
+        visited = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            visited += 1
+            d = edit_distance(word, self.words[node])
+            if d <= max_distance:
+                candidates.append(self.words[node])
+            lo, hi = d - max_distance, d + max_distance
+            for k, child in self.children[node].items():
+                if lo <= k <= hi:
+                    stack.append(child)
+        return candidates, visited
+
+    def lookup(self, word, max_distance=2):
+        """Return all indexed words within max_distance of word"""
+        return self.search(word, max_distance)[0]
+
+    def save(self, path=INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path=INDEX_PATH):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+def load_or_build(words, path=INDEX_PATH):
+    """Load the tree from disk if it matches words, otherwise build and save it"""
+    fingerprint = vocab_fingerprint(words)
+    if os.path.exists(path):
+        try:
+            tree = BKTree.load(path)
+            if tree.fingerprint == fingerprint:
+                return tree
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    tree = BKTree(words)
+    try:
+        tree.save(path)
+    except OSError:
+        pass  # read-only deployment: keep the in-memory tree
+    return tree
+
+# -----------------------------
+# Build from the corpus vocabulary and report pruning
+# -----------------------------
+if __name__ == "__main__":
+    from user_preprocess import FUNCTION_WORDS
+
+    with open("vocabulary.txt", "r", encoding="utf-8") as f:
+        vocab = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS
+
+    tree = BKTree(vocab)
+    tree.save()
+    print(f"BK-tree built. Nodes: {len(tree)}")
+
+    for query in ["mny", "feild", "algoritm", "optimisation", "lerning"]:
+        for k in (1, 2):
+            found, visited = tree.search(query, k)
+            print(f"{query!r} d<={k}: {len(found)} candidates, "
+                  f"visited {visited}/{len(tree)} nodes ({visited / len(tree):.1%})")
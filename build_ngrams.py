@@ -0,0 +1,61 @@
+# build_ngrams.py
+"""
+Stage 4: Build unigram & bigram counts (for real-word detection and ranking)
+- Stream tokens.txt in one pass, in fixed-size blocks of lines
+- Count unigrams and adjacent-token bigrams (including across block borders)
+- Save them in the format corrections.py loads:
+    unigram_counts.pkl: Counter {word: count}
+    bigram_counts.pkl : Counter {(w1, w2): count}
+- Memory is bounded by the number of distinct n-grams, not by the corpus size
+"""
+
+import pickle
+import time
+from collections import Counter
+from itertools import islice
+
+BLOCK_LINES = 1 << 20
+
+def iter_token_blocks(path="tokens.txt", block_lines=BLOCK_LINES):
+    """Yield lists of tokens (one per line) without reading the whole file"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.rstrip("\r\n") for line in f)
+        while True:
+            block = list(islice(lines, block_lines))
+            if not block:
+                return
+            yield block
+
+def count_ngrams(blocks, unigrams=None, bigrams=None, prev=None):
+    """
+    Add unigram and bigram counts from token blocks to the given Counters.
+    prev is the token preceding the first block (None at the start of a corpus).
+    Returns (unigrams, bigrams, last token, number of tokens).
+    """
+    unigrams = Counter() if unigrams is None else unigrams
+    bigrams = Counter() if bigrams is None else bigrams
+    n_tokens = 0
+    for block in blocks:
+        if not block:
+            continue
+        unigrams.update(block)
+        if prev is not None:
+            bigrams[(prev, block[0])] += 1
+        bigrams.update(zip(block, block[1:]))
+        prev = block[-1]
+        n_tokens += len(block)
+    return unigrams, bigrams, prev, n_tokens
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    unigrams, bigrams, _, n_tokens = count_ngrams(iter_token_blocks())
+
+    with open("unigram_counts.pkl", "wb") as f:
+        pickle.dump(unigrams, f)
+
+    with open("bigram_counts.pkl", "wb") as f:
+        pickle.dump(bigrams, f)
+
+    elapsed = time.perf_counter() - start
+    print(f"Stage 4: N-gram counts built. Tokens: {n_tokens} | Unigrams: {len(unigrams)} | "
+          f"Bigrams: {len(bigrams)} | {n_tokens / elapsed:.0f} tokens/sec")
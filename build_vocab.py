@@ -9,23 +9,32 @@ Stage 3: Build vocabulary & word frequency
 from collections import Counter
 import pickle
 
-# Read tokens
-with open("tokens.txt", "r", encoding="utf-8") as f:
-    tokens = f.read().splitlines()
+MIN_FREQ = 2
 
-# Count frequencies
-word_freq = Counter(tokens)
+def build_vocabulary(word_freq, min_freq=MIN_FREQ):
+    """Optional: remove extremely rare words (threshold >=2)"""
+    return {word for word, freq in word_freq.items() if freq >= min_freq}
 
-# Optional: remove extremely rare words (threshold >=2)
-vocab = {word for word, freq in word_freq.items() if freq >= 2}
-
-# Save vocabulary
-with open("vocabulary.txt", "w", encoding="utf-8") as f:
+def write_vocabulary(vocab, f):
     for word in sorted(vocab):
         f.write(word + "\n")
 
-# Save word frequency dictionary
-with open("word_freq.pkl", "wb") as f:
-    pickle.dump(word_freq, f)
+if __name__ == "__main__":
+    # Read tokens
+    with open("tokens.txt", "r", encoding="utf-8") as f:
+        tokens = f.read().splitlines()
+
+    # Count frequencies
+    word_freq = Counter(tokens)
+
+    vocab = build_vocabulary(word_freq)
+
+    # Save vocabulary
+    with open("vocabulary.txt", "w", encoding="utf-8") as f:
+        write_vocabulary(vocab, f)
+
+    # Save word frequency dictionary
+    with open("word_freq.pkl", "wb") as f:
+        pickle.dump(word_freq, f)
 
-print(f"Stage 3: Vocabulary built. Unique words: {len(vocab)}")
+    print(f"Stage 3: Vocabulary built. Unique words: {len(vocab)}")
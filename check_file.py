@@ -0,0 +1,142 @@
+# check_file.py
+"""
+Streaming command-line spelling checker
+- Reads a file (or stdin) as a stream of lines or sentences
+- Runs each unit through preprocess_user_input / detect_errors in batches
+- Writes one JSON object per error as soon as its batch is done:
+    {"line", "offset", "word", "type", "suggestions"}
+  (line is 1-based, offset is the 0-based character column within that line)
+- Memory stays flat: input is read incrementally and only a bounded number of
+  batches is in flight; a line or sentence longer than MAX_UNIT_CHARS is
+  checked in pieces cut at whitespace (a word is split only when no
+  whitespace falls within MAX_UNIT_CHARS), so one huge line is never held whole
+- Reports throughput (tokens/sec) on stderr when finished
+
+Usage:
+    python check_file.py corpus.txt -o errors.jsonl
+    cat notes.txt | python check_file.py --unit sentence
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from itertools import tee
+
+from corrections import iter_detect_errors
+from user_preprocess import token_spans
+
+BLOCK_SIZE = 1 << 16       # characters read per block in sentence mode
+MAX_UNIT_CHARS = 10000     # lines and sentences longer than this are cut at whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+# -----------------------------
+# Input units
+# -----------------------------
+def _advance(line, col, text):
+    """Position just after text, given the position of its first character"""
+    newlines = text.count("\n")
+    if newlines:
+        return line + newlines, len(text) - text.rfind("\n") - 1
+    return line, col + len(text)
+
+def read_lines(stream):
+    """Yield (line, column, text) for every line (in pieces when longer than MAX_UNIT_CHARS)"""
+    line, col, buf = 1, 0, ""  # buf: the current line's unchecked text, starting at col
+    while True:
+        chunk = stream.readline(MAX_UNIT_CHARS - len(buf))
+        if not chunk:
+            if buf:
+                yield line, col, buf
+            return
+        buf += chunk
+        if buf.endswith("\n"):
+            yield line, col, buf[:-1]
+            line, col, buf = line + 1, 0, ""
+        elif len(buf) >= MAX_UNIT_CHARS:
+            cut = buf.rfind(" ") + 1 or len(buf)
+            yield line, col, buf[:cut]
+            col += cut
+            buf = buf[cut:]
+
+def read_sentences(stream):
+    """Yield (line, column, text) for every sentence; sentences may span lines"""
+    buf = ""
+    line, col = 1, 0  # position of buf[0]
+    while True:
+        block = stream.read(BLOCK_SIZE)
+        buf += block
+        pos = 0
+        for m in SENTENCE_END.finditer(buf):
+            yield line, col, buf[pos:m.end()]
+            line, col = _advance(line, col, buf[pos:m.end()])
+            pos = m.end()
+        while len(buf) - pos > MAX_UNIT_CHARS:
+            cut = buf.rfind(" ", pos, pos + MAX_UNIT_CHARS) + 1 or pos + MAX_UNIT_CHARS
+            yield line, col, buf[pos:cut]
+            line, col = _advance(line, col, buf[pos:cut])
+            pos = cut
+        buf = buf[pos:]
+        if not block:
+            if buf:
+                yield line, col, buf
+            return
+
+# -----------------------------
+# Checking
+# -----------------------------
+def check_stream(stream, out, unit="line", workers=1, batch_size=256):
+    """Check every unit of stream, writing JSON Lines to out; returns the token count"""
+    units = read_sentences(stream) if unit == "sentence" else read_lines(stream)
+    units, texts = tee(units)
+    results = iter_detect_errors((text for _, _, text in texts), workers, batch_size)
+
+    n_tokens = 0
+    for (line, col, text), errors in zip(units, results):
+        spans = token_spans(text)
+        n_tokens += len(spans)
+        for err in errors:
+            start = spans[err['index']][0]
+            newlines = text.count("\n", 0, start)
+            if newlines:
+                err_line, err_col = line + newlines, start - text.rfind("\n", 0, start) - 1
+            else:
+                err_line, err_col = line, col + start
+            out.write(json.dumps({
+                "line": err_line,
+                "offset": err_col,
+                "word": err['word'],
+                "type": err['type'],
+                "suggestions": err['suggestions'],
+            }) + "\n")
+        if errors:
+            out.flush()
+    return n_tokens
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spell-check a text stream and write JSON Lines")
+    parser.add_argument("input", nargs="?", default="-", help="input file ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output file ('-' for stdout)")
+    parser.add_argument("--unit", choices=["line", "sentence"], default="line",
+                        help="check line by line or sentence by sentence")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--batch-size", type=int, default=256, help="units per tagging batch")
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8", errors="ignore")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        n_tokens = check_stream(stream, out, args.unit, args.workers, args.batch_size)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    rate = n_tokens / elapsed if elapsed > 0 else 0.0
+    print(f"Checked {n_tokens} tokens in {elapsed:.2f}s ({rate:.0f} tokens/sec)", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
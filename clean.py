@@ -4,19 +4,48 @@ Stage 1: Clean the raw dataset.
 - Lowercase text
 - Remove extra whitespace
 - Save cleaned text
+- Streams the input in fixed-size chunks, so peak memory does not depend on
+  the corpus size; output is identical to cleaning the whole text at once
 """
 
-with open("data2.txt", "r", encoding="utf-8", errors="ignore") as f:
-    text = f.read()
+CHUNK_SIZE = 1 << 20       # characters per read
+MAX_WORD_CHARS = 1 << 20   # a run without whitespace longer than this is written in pieces
+WORD_TAIL = 1024           # ...keeping this much of it for the next chunk
 
-# Lowercase
-cleaned_text = text.lower()
+def clean_stream(src, dst, chunk_size=CHUNK_SIZE):
+    """
+    Write " ".join(src.read().lower().split()) to dst without holding the whole
+    text: a word cut by a chunk border is carried over to the next chunk.
+    """
+    carry = ""
+    need_space = False  # False at the start and while continuing a word written in pieces
+    while True:
+        chunk = src.read(chunk_size)
+        buf = carry + chunk
+        words = buf.split()
+        carry = ""
+        if chunk and words and not buf[-1].isspace():
+            carry = words.pop()  # may continue in the next chunk
 
-# Remove extra whitespace
-cleaned_text = " ".join(cleaned_text.split())
+        if words:
+            if need_space:
+                dst.write(" ")
+            dst.write(" ".join(words).lower())
+            need_space = True
 
-# Save cleaned text
-with open("cleaned.txt", "w", encoding="utf-8") as f:
-    f.write(cleaned_text)
+        if len(carry) > MAX_WORD_CHARS:
+            if need_space:
+                dst.write(" ")
+            dst.write(carry[:-WORD_TAIL].lower())
+            carry = carry[-WORD_TAIL:]
+            need_space = False
 
-print("Stage 1: Cleaning complete.")
+        if not chunk:
+            return
+
+if __name__ == "__main__":
+    with open("data2.txt", "r", encoding="utf-8", errors="ignore") as src, \
+            open("cleaned.txt", "w", encoding="utf-8") as dst:
+        clean_stream(src, dst)
+
+    print("Stage 1: Cleaning complete.")
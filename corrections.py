@@ -6,46 +6,234 @@ Spelling & Grammar Correction Module
 - Grammar-aware display (e.g., is + rise → is rising)
 """
 
-import pickle
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
 from nltk.metrics.distance import edit_distance
-from user_preprocess import preprocess_user_input, apply_display_grammar, FUNCTION_WORDS
+from user_preprocess import preprocess_user_input, preprocess_user_inputs, analyze_user_input, FUNCTION_WORDS
+import symspell
+import bktree
+import edit_kernel
+import metrics
+import model_bundle
+import neighbor_graph
+from bigram_matrix import BigramMatrix
+from lru_cache import LRUCache
 
 # -----------------------------
-# Load precomputed models
+# Result caches (bounded LRU, keyed on the model version so a reload never serves stale results)
 # -----------------------------
-with open("vocabulary.txt", "r", encoding="utf-8") as f:
-    VOCAB = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS  # ensure lowercase
+CACHE_SIZE = 10000
+CANDIDATE_CACHE = LRUCache(CACHE_SIZE)   # (version, token, max_distance, engine) -> candidates
+SUGGESTION_CACHE = LRUCache(CACHE_SIZE)  # (version, token, prev word) -> ranked suggestions
 
-with open("word_freq.pkl", "rb") as f:
-    WORD_FREQ = pickle.load(f)
+def set_cache_size(maxsize):
+    """Resize both result caches (0 disables caching)"""
+    CANDIDATE_CACHE.resize(maxsize)
+    SUGGESTION_CACHE.resize(maxsize)
 
-with open("bigram_counts.pkl", "rb") as f:
-    BIGRAM_COUNTS = pickle.load(f)
+def cache_stats():
+    """Hit / miss / eviction counters for the result caches"""
+    return {"candidates": CANDIDATE_CACHE.stats(), "suggestions": SUGGESTION_CACHE.stats()}
 
-with open("unigram_counts.pkl", "rb") as f:
-    UNIGRAM_COUNTS = pickle.load(f)
+# -----------------------------
+# Candidate engines (indexes over VOCAB, cached on disk, rebuilt when the vocabulary changes)
+# -----------------------------
+# "symspell": deletion index | "symspell_flat": the same index as flat memory-mapped
+# arrays (slower lookups, but shared by forked workers, see prefork.py)
+# "bktree": BK-tree | "numpy": batched banded DP kernel
+# "dawg": Levenshtein automaton over the VOCAB trie | "scan": brute force over VOCAB
+CANDIDATE_ENGINE = "symspell"
+
+ENGINE_BUILDERS = {
+    "symspell": lambda models: symspell.load_or_build(models.vocab),
+    "symspell_flat": lambda models: symspell.load_or_build_flat(models.vocab),
+    "bktree": lambda models: bktree.load_or_build(models.vocab),
+    "numpy": lambda models: edit_kernel.VocabMatrix(models.vocab),
+    "dawg": lambda models: models.vocab,
+    # Not a general engine: only answers for vocabulary words (see USE_NEIGHBOR_GRAPH)
+    "neighbors": lambda models: neighbor_graph.load_or_build(models.vocab),
+}
 
-TOTAL_UNIGRAMS = sum(UNIGRAM_COUNTS.values())
-VOCAB_SIZE = len(VOCAB)  # for Laplace smoothing
+# Candidates for vocabulary words (the real-word path) come from the precomputed
+# neighbor graph instead of a search; rebuilt on disk when the vocabulary changes
+USE_NEIGHBOR_GRAPH = True
+
+# A misspelling and a few real words: warmup() sends it down every detection path
+WARMUP_TEXT = "warm up the taggr and the lemmatizer before the first request"
+
+# -----------------------------
+# Model state (loaded lazily on first use)
+# -----------------------------
+class CorrectionModels:
+    """
+    Vocabulary, n-gram models and candidate indexes.
+    Nothing is read from disk until the first detection call (or warmup()),
+    so importing this module stays cheap.
+    """
+
+    def __init__(self):
+        self.version = 0        # bumped on every (re)load; part of every cache key
+        self.timings = {}       # load phase -> seconds
+        self.loaded = False
+        self._engines = {}
+        self._lock = threading.RLock()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load()
+        return self
+
+    def load(self):
+        """(Re)load the vocabulary and n-gram models, dropping indexes and cached results"""
+        with self._lock:
+            start = time.perf_counter()
+            # One memory-mapped bundle compiled from vocabulary.txt and the pickles
+            # (recompiled automatically when they change, see model_bundle.py)
+            self.bundle = model_bundle.load_or_build(extra_vocab=FUNCTION_WORDS)
+            self.timings["bundle"] = time.perf_counter() - start
+
+            # VOCAB is a minimized trie (DAWG): supports `in`, iteration and len() like the old set
+            self.vocab = self.bundle.vocab
+            # Read-only dict-like views: .get() works as on the old dicts
+            self.word_freq = self.bundle.word_freq
+            self.bigram_counts = self.bundle.bigram_counts
+            self.unigram_counts = self.bundle.unigram_counts
+
+            self.total_unigrams = self.bundle.total_unigrams
+            self.vocab_size = len(self.vocab)  # for Laplace smoothing
+            self.bigram_matrix = BigramMatrix(self.bundle, self.vocab_size)
+
+            self._engines.clear()
+            CANDIDATE_CACHE.clear()
+            SUGGESTION_CACHE.clear()
+            self.version += 1
+            self.loaded = True
+
+    def engine(self, name):
+        """Return the candidate index for name, building or loading it on first use"""
+        index = self._engines.get(name)
+        if index is None:
+            self.ensure_loaded()
+            with self._lock:
+                index = self._engines.get(name)
+                if index is None:
+                    start = time.perf_counter()
+                    index = ENGINE_BUILDERS[name](self)
+                    self.timings[f"engine:{name}"] = time.perf_counter() - start
+                    self._engines[name] = index
+        return index
+
+    def warmup(self, engines=None, tagger=True):
+        """
+        Load everything a first request would otherwise pay for: the models,
+        the candidate indexes (default: CANDIDATE_ENGINE and the neighbor
+        graph) and the POS tagger, then runs one detection so lazily created
+        state (regex and numpy caches, first-call allocations) exists before
+        any fork (see prefork.py).
+        Returns the per-phase timings in seconds.
+        """
+        self.ensure_loaded()
+        if engines is None:
+            engines = [CANDIDATE_ENGINE] + (["neighbors"] if USE_NEIGHBOR_GRAPH else [])
+        for name in engines:
+            if name != "scan":
+                self.engine(name)
+        if tagger:
+            start = time.perf_counter()
+            preprocess_user_input(WARMUP_TEXT)
+            self.timings["tagger"] = time.perf_counter() - start
+            start = time.perf_counter()
+            detect_errors(WARMUP_TEXT)
+            self.timings["detect"] = time.perf_counter() - start
+        return dict(self.timings)
+
+MODELS = CorrectionModels()
+
+def load_models():
+    """(Re)load the models now; invalidates indexes and cached results"""
+    MODELS.load()
+
+def warmup(engines=None, tagger=True):
+    """Preload models, candidate indexes and the tagger; returns per-phase timings"""
+    return MODELS.warmup(engines, tagger)
+
+def load_timings():
+    """Seconds spent in each load phase so far"""
+    return dict(MODELS.timings)
+
+def get_engine(name):
+    """Return the candidate index for name, loading it on first use"""
+    return MODELS.engine(name)
+
+# Backwards-compatible module attributes (VOCAB, WORD_FREQ, ...) resolve to the lazy state
+_LEGACY_ATTRS = {
+    "BUNDLE": "bundle",
+    "VOCAB": "vocab",
+    "WORD_FREQ": "word_freq",
+    "BIGRAM_COUNTS": "bigram_counts",
+    "UNIGRAM_COUNTS": "unigram_counts",
+    "TOTAL_UNIGRAMS": "total_unigrams",
+    "VOCAB_SIZE": "vocab_size",
+}
+
+def __getattr__(name):
+    if name in _LEGACY_ATTRS:
+        return getattr(MODELS.ensure_loaded(), _LEGACY_ATTRS[name])
+    if name == "MODEL_VERSION":
+        return MODELS.version
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -----------------------------
 # Bigram probability with Laplace smoothing
 # -----------------------------
 def bigram_prob_laplace(w1, w2):
     """Returns P(w2 | w1) with add-one (Laplace) smoothing"""
+    m = MODELS.ensure_loaded()
     w1 = w1.lower()
     w2 = w2.lower()
-    count_bigram = BIGRAM_COUNTS.get((w1, w2), 0)
-    count_unigram = UNIGRAM_COUNTS.get(w1, 0)
-    return (count_bigram + 1) / (count_unigram + VOCAB_SIZE)
+    count_bigram = m.bigram_counts.get((w1, w2), 0)
+    count_unigram = m.unigram_counts.get(w1, 0)
+    return (count_bigram + 1) / (count_unigram + m.vocab_size)
 
 # -----------------------------
 # Candidate generation and ranking
 # -----------------------------
-def generate_candidates(word, max_distance=2):
+def generate_candidates(word, max_distance=2, engine=None):
     """Generate candidates from VOCAB within edit distance threshold"""
+    m = MODELS.ensure_loaded()
     word = word.lower()
-    return [w for w in VOCAB if edit_distance(word, w) <= max_distance]
+    engine = engine or CANDIDATE_ENGINE
+    key = (m.version, word, max_distance, engine)
+    cached = CANDIDATE_CACHE.get(key)
+    if cached is not None:
+        metrics.count("candidate_cache_hits")
+        return list(cached)
+    metrics.count("candidate_cache_misses")
+    with metrics.timer("candidates"):
+        candidates = _search_candidates(m, word, max_distance, engine)
+    metrics.count("candidates_returned", len(candidates))
+    CANDIDATE_CACHE.put(key, tuple(candidates))
+    return candidates
+
+def _search_candidates(m, word, max_distance, engine):
+    candidates = None
+    if USE_NEIGHBOR_GRAPH and engine != "scan" and word in m.vocab:
+        graph = m.engine("neighbors")
+        if max_distance <= graph.max_distance:
+            candidates = graph.lookup(word, max_distance)
+    if candidates is None and engine != "scan":
+        index = m.engine(engine)
+        if max_distance <= index.max_distance:
+            candidates = index.lookup(word, max_distance)
+    if candidates is None:
+        candidates = [w for w in m.vocab if edit_distance(word, w) <= max_distance]
+    return candidates
 
 def rank_candidates(candidates, prev_word=None):
     """
@@ -53,14 +241,51 @@ def rank_candidates(candidates, prev_word=None):
     1. Bigram probability (if previous word given)
     2. Word frequency
     """
-    ranked = []
-    for cand in candidates:
-        score = WORD_FREQ.get(cand, 0) / TOTAL_UNIGRAMS  # frequency component
-        if prev_word and prev_word.lower() not in FUNCTION_WORDS:
-            score += bigram_prob_laplace(prev_word, cand)
-        ranked.append((cand, score))
-    ranked.sort(key=lambda x: x[1], reverse=True)
-    return [w for w, _ in ranked[:5]]  # top 5 suggestions
+    return [w for w, _ in rank_candidates_scored(candidates, prev_word)]
+
+def rank_candidates_scored(candidates, prev_word=None):
+    """rank_candidates with the score of each suggestion: [(word, score), ...]"""
+    m = MODELS.ensure_loaded()
+    prev = prev_word.lower() if prev_word else None
+    if prev in FUNCTION_WORDS:
+        prev = None
+    # Vectorized over the CSR bigram matrix; same scores and order as scoring
+    # each candidate with bigram_prob_laplace and sorting
+    with metrics.timer("rank"):
+        return m.bigram_matrix.rank_scored(candidates, prev, k=5)  # top 5 suggestions
+
+def suggest(token, prev_word=None):
+    """Ranked suggestions for a token, memoized per (token, previous word, model version)"""
+    return [w for w, _, _ in suggest_scored(token, prev_word)]
+
+def suggest_scored(token, prev_word=None):
+    """suggest() as (word, edit distance to token, score) records, computed once per cache entry"""
+    token_lc = token.lower()
+    # The previous word only affects ranking when it is not a function word
+    prev_key = prev_word.lower() if prev_word else None
+    if prev_key in FUNCTION_WORDS:
+        prev_key = None
+    key = (MODELS.ensure_loaded().version, token_lc, prev_key)
+    cached = SUGGESTION_CACHE.get(key)
+    if cached is not None:
+        metrics.count("suggestion_cache_hits")
+    else:
+        metrics.count("suggestion_cache_misses")
+        ranked = rank_candidates_scored(generate_candidates(token_lc), prev_word)
+        cached = tuple((w, edit_distance(token_lc, w), score) for w, score in ranked)
+        SUGGESTION_CACHE.put(key, cached)
+    return list(cached)
+
+def _error(token, index, kind, prev_word):
+    records = suggest_scored(token.lower(), prev_word)
+    return {
+        'word': token,
+        'index': index,
+        'type': kind,
+        'suggestions': [w for w, _, _ in records],
+        'distances': [d for _, d, _ in records],
+        'scores': [s for _, _, s in records],
+    }
 
 # -----------------------------
 # Main error detection
@@ -68,10 +293,22 @@ def rank_candidates(candidates, prev_word=None):
 def detect_errors(user_text):
     """
     Detect non-word and real-word errors
-    Returns a list of dicts: {'word', 'type', 'suggestions'}
+    user_text may be a string or a TextAnalysis (see analyze_user_input)
+    Returns a list of dicts: {'word', 'index', 'type', 'suggestions', 'distances', 'scores'}
+    ('index' is the token position in preprocess_user_input(user_text);
+    'distances' and 'scores' give the edit distance and ranking score of each suggestion)
     """
-    tokens = preprocess_user_input(user_text)
+    return detect_errors_in_tokens(analyze_user_input(user_text).lemmas)
+
+def detect_errors_in_tokens(tokens):
+    """detect_errors on already preprocessed (lemmatized) tokens"""
+    with metrics.timer("detect"):
+        return _detect_errors_in_tokens(tokens)
+
+def _detect_errors_in_tokens(tokens):
+    vocab = MODELS.ensure_loaded().vocab
     errors = []
+    oov = real_word_checks = 0
 
     for i, token in enumerate(tokens):
         token_lc = token.lower()
@@ -82,27 +319,71 @@ def detect_errors(user_text):
             continue
 
         # Non-word error
-        if token_lc not in VOCAB:
-            candidates = generate_candidates(token_lc)
-            errors.append({
-                'word': token,
-                'type': 'non-word',
-                'suggestions': rank_candidates(candidates, prev_word)
-            })
+        if token_lc not in vocab:
+            oov += 1
+            errors.append(_error(token, i, 'non-word', prev_word))
         else:
             # Real-word error (contextually unlikely)
             if prev_word and prev_word.lower() not in FUNCTION_WORDS:
+                real_word_checks += 1
                 prob = bigram_prob_laplace(prev_word, token_lc)
                 if prob < 1e-6:  # adjust threshold based on corpus
-                    candidates = generate_candidates(token_lc)
-                    errors.append({
-                        'word': token,
-                        'type': 'real-word',
-                        'suggestions': rank_candidates(candidates, prev_word)
-                    })
+                    errors.append(_error(token, i, 'real-word', prev_word))
 
+    if metrics.enabled:
+        metrics.count("checked_tokens", len(tokens))
+        metrics.count("oov_tokens", oov)
+        metrics.count("real_word_checks", real_word_checks)
+        metrics.count("errors", len(errors))
     return errors
 
+# -----------------------------
+# Batch detection (offline jobs)
+# -----------------------------
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _detect_chunk(texts):
+    """Worker task: tag the whole chunk in one batch, then detect"""
+    return [detect_errors_in_tokens(tokens) for tokens in preprocess_user_inputs(texts)]
+
+def iter_detect_errors(texts, workers=None, chunksize=256):
+    """
+    Streaming form of detect_errors_batch: yields one error list per text, in
+    input order. At most 2 * workers chunks are in flight, so memory stays
+    bounded however long the input iterable is.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(texts, chunksize)
+    if workers == 1:
+        for chunk in chunks:
+            yield from _detect_chunk(chunk)
+        return
+    MODELS.warmup(tagger=False)  # load before forking so workers inherit models and indexes
+    with Pool(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_detect_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def detect_errors_batch(texts, workers=None, chunksize=256):
+    """
+    detect_errors over many documents, fanned out to a process pool.
+    Each worker loads the models once (the bundle is memory-mapped, so the
+    pages are shared) and keeps its result caches across chunks. Results are
+    returned in input order.
+    workers=None uses every core; workers=1 runs in-process.
+    """
+    return list(iter_detect_errors(texts, workers, chunksize))
+
 # -----------------------------
 # Display-friendly tokens
 # -----------------------------
@@ -112,18 +393,19 @@ def display_tokens(user_text):
         - grammar-corrected indices
         - grammar map (original -> corrected)
     Example: is + rise → is rising
+    user_text may be a string or a TextAnalysis (see analyze_user_input)
     """
-    lemmas = preprocess_user_input(user_text)
-    display_version, grammar_indices, grammar_map = apply_display_grammar(lemmas)
-    return display_version, grammar_indices, grammar_map
+    analysis = analyze_user_input(user_text)
+    return analysis.display_tokens, analysis.grammar_indices, analysis.grammar_map
 
 # -----------------------------
 # Example usage
 # -----------------------------
 if __name__ == "__main__":
     test_sentence = "AI helps in mny field. The technique automatically determines which optimization algorithm it should use."
-    display, grammar_idxs, grammar_map = display_tokens(test_sentence)
-    errors = detect_errors(test_sentence)
+    analysis = analyze_user_input(test_sentence)  # tag once, use for both
+    display, grammar_idxs, grammar_map = display_tokens(analysis)
+    errors = detect_errors(analysis)
     print("Display:", display)
     print("Grammar indices:", grammar_idxs)
     print("Grammar map:", grammar_map)
@@ -0,0 +1,171 @@
+# dawg.py
+"""
+Compressed lexicon: minimized trie (DAWG)
+- Built from sorted words with incremental minimization (Daciuk et al.), so
+  equivalent suffix subtrees are stored once
+- Flattened into typed arrays (edge labels, edge targets, per-state offsets,
+  final flags) instead of one Python object per word
+- Membership in O(len(word)) with a binary search over each state's edges
+- Fuzzy search walks the trie with a Levenshtein automaton (one DP row per
+  prefix); prefixes whose row minimum exceeds max_distance are pruned, and
+  words sharing a prefix share its rows
+"""
+
+from array import array
+from bisect import bisect_left
+from symspell import vocab_fingerprint
+
+# -----------------------------
+# Construction
+# -----------------------------
+def _build_states(words):
+    """Return (edges, final) for the minimized automaton; state 0 is the root"""
+    edges = [{}]
+    final = [False]
+    register = {}
+    unchecked = []  # (parent, char, child) along the last inserted word
+    prev_word = ""
+
+    def minimize(down_to):
+        while len(unchecked) > down_to:
+            parent, ch, child = unchecked.pop()
+            key = (final[child], tuple(sorted(edges[child].items())))
+            if key in register:
+                edges[parent][ch] = register[key]
+            else:
+                register[key] = child
+
+    for word in words:
+        common = 0
+        for a, b in zip(word, prev_word):
+            if a != b:
+                break
+            common += 1
+        minimize(common)
+        node = unchecked[-1][2] if unchecked else 0
+        for ch in word[common:]:
+            edges.append({})
+            final.append(False)
+            child = len(edges) - 1
+            edges[node][ch] = child
+            unchecked.append((node, ch, child))
+            node = child
+        final[node] = True
+        prev_word = word
+    minimize(0)
+    return edges, final
+
+# -----------------------------
+# Lexicon
+# -----------------------------
+class DAWG:
+    """Minimized trie over a fixed vocabulary; usable wherever VOCAB was a set"""
+
+    # Any radius can be searched; kept for interface parity with the other engines
+    max_distance = float("inf")
+
+    def __init__(self, words):
+        words = sorted(set(words))
+        self.fingerprint = vocab_fingerprint(words)
+        self.size = len(words)
+        edges, final = _build_states(words)
+
+        # Renumber reachable states breadth-first and flatten the edges
+        order = {0: 0}
+        queue = [0]
+        for old in queue:
+            for ch in sorted(edges[old]):
+                target = edges[old][ch]
+                if target not in order:
+                    order[target] = len(queue)
+                    queue.append(target)
+        self.offsets = array("I", [0])   # state -> first edge; edges of s are offsets[s]:offsets[s + 1]
+        self.labels = array("I")         # edge -> code point
+        self.targets = array("I")        # edge -> target state
+        self.final = bytearray(len(queue))
+        for new, old in enumerate(queue):
+            self.final[new] = final[old]
+            for ch in sorted(edges[old]):
+                self.labels.append(ord(ch))
+                self.targets.append(order[edges[old][ch]])
+            self.offsets.append(len(self.labels))
+
+    @classmethod
+    def from_buffers(cls, offsets, labels, targets, final, size, fingerprint):
+        """Wrap existing arrays (e.g. memoryviews into a memory-mapped model bundle)"""
+        lexicon = cls.__new__(cls)
+        lexicon.offsets, lexicon.labels, lexicon.targets, lexicon.final = offsets, labels, targets, final
+        lexicon.size = size
+        lexicon.fingerprint = fingerprint
+        return lexicon
+
+    def __len__(self):
+        return self.size
+
+    def _step(self, state, ch):
+        lo, hi = self.offsets[state], self.offsets[state + 1]
+        code = ord(ch)
+        e = bisect_left(self.labels, code, lo, hi)
+        if e < hi and self.labels[e] == code:
+            return self.targets[e]
+        return -1
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        state = 0
+        for ch in word:
+            state = self._step(state, ch)
+            if state < 0:
+                return False
+        return bool(self.final[state])
+
+    def __iter__(self):
+        """Yield the words in sorted order"""
+        stack = [(0, "")]
+        while stack:
+            state, prefix = stack.pop()
+            if self.final[state]:
+                yield prefix
+            lo, hi = self.offsets[state], self.offsets[state + 1]
+            for e in range(hi - 1, lo - 1, -1):
+                stack.append((self.targets[e], prefix + chr(self.labels[e])))
+
+    def lookup(self, word, max_distance=2):
+        """Return all words within max_distance (Levenshtein) of word"""
+        n = len(word)
+        results = []
+        stack = [(0, "", list(range(n + 1)))]
+        while stack:
+            state, prefix, row = stack.pop()
+            if self.final[state] and row[n] <= max_distance:
+                results.append(prefix)
+            for e in range(self.offsets[state], self.offsets[state + 1]):
+                ch = chr(self.labels[e])
+                new_row = [row[0] + 1]
+                for j in range(1, n + 1):
+                    new_row.append(min(new_row[j - 1] + 1,
+                                       row[j] + 1,
+                                       row[j - 1] + (word[j - 1] != ch)))
+                if min(new_row) <= max_distance:
+                    stack.append((self.targets[e], prefix + ch, new_row))
+        return results
+
+# -----------------------------
+# Compare the lexicon's memory with a set of the corpus vocabulary
+# -----------------------------
+if __name__ == "__main__":
+    import sys
+    from user_preprocess import FUNCTION_WORDS
+
+    with open("vocabulary.txt", "r", encoding="utf-8") as f:
+        vocab = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS
+
+    lexicon = DAWG(vocab)
+
+    set_bytes = sys.getsizeof(vocab) + sum(sys.getsizeof(w) for w in vocab)
+    dawg_bytes = sum(sys.getsizeof(a) for a in (lexicon.offsets, lexicon.labels,
+                                                lexicon.targets, lexicon.final))
+    print(f"DAWG built. Words: {len(lexicon)} | States: {len(lexicon.final)} | "
+          f"Edges: {len(lexicon.labels)}")
+    print(f"Memory: set {set_bytes / 1024:.0f} KiB | DAWG {dawg_bytes / 1024:.0f} KiB")
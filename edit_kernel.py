@@ -0,0 +1,144 @@
+# edit_kernel.py
+"""
+Vectorized batch edit-distance kernel (NumPy)
+- Encode the vocabulary once as a padded integer matrix, rows sorted by length
+- Words of length len(query) ± max_distance form one contiguous block of rows,
+  so length filtering is a slice
+- Banded Levenshtein: only cells with |i - j| <= max_distance are computed,
+  values are saturated at max_distance + 1 and (query, word) pairs whose row
+  minimum leaves the band are dropped early
+- Many queries can be scored in one pass (lookup_many)
+"""
+
+import numpy as np
+
+# Upper bound on (query, word) pairs held in one DP batch (keeps memory bounded)
+MAX_PAIRS = 1 << 18
+
+# -----------------------------
+# Encoding
+# -----------------------------
+def encode(words, width):
+    """Encode words as a (len(words), width) uint32 matrix of code points, zero padded"""
+    codes = np.zeros((len(words), width), dtype=np.uint32)
+    for row, w in enumerate(words):
+        if w:
+            codes[row, :len(w)] = np.frombuffer(w.encode("utf-32-le"), dtype=np.uint32)
+    return codes
+
+# -----------------------------
+# Kernel
+# -----------------------------
+def banded_distances(qcodes, qlens, wcodes, wlens, max_distance):
+    """
+    Levenshtein distance for each row pair (qcodes[p], wcodes[p]).
+    Distances above max_distance are reported as max_distance + 1.
+    Pairs must satisfy |qlens - wlens| <= max_distance.
+    """
+    k = max_distance
+    cap = k + 1
+    n_pairs = len(qlens)
+    result = np.full(n_pairs, cap, dtype=np.int16)
+    if n_pairs == 0:
+        return result
+
+    width = wcodes.shape[1]
+    cols = np.arange(width + 1, dtype=np.int16)
+    alive = np.arange(n_pairs)
+    qlens = qlens.astype(np.int16)
+    wlens = wlens.astype(np.int16)
+
+    # Row 0 of the DP table: distance from the empty prefix
+    prev = np.broadcast_to(np.minimum(cols, cap), (n_pairs, width + 1)).copy()
+    done = qlens == 0
+    if done.any():
+        result[done] = np.minimum(wlens[done], cap)
+
+    for i in range(1, int(qlens.max()) + 1):
+        keep = qlens[alive] >= i
+        alive, prev = alive[keep], prev[keep]
+        if len(alive) == 0:
+            break
+        lo, hi = max(0, i - k), min(width, i + k)
+        cur = np.full_like(prev, cap)
+        start = lo
+        if lo == 0:
+            cur[:, 0] = min(i, cap)
+            start = 1
+        if start <= hi:
+            mismatch = wcodes[alive, start - 1:hi] != qcodes[alive, i - 1:i]
+            cur[:, start:hi + 1] = np.minimum(prev[:, start:hi + 1] + 1,
+                                              prev[:, start - 1:hi] + mismatch)
+        # Insertions along the row: cur[j] = min_t (cur[t] + j - t), a running minimum
+        band = cur[:, lo:hi + 1] - cols[lo:hi + 1]
+        np.minimum.accumulate(band, axis=1, out=band)
+        cur[:, lo:hi + 1] = np.minimum(band + cols[lo:hi + 1], cap)
+
+        finished = qlens[alive] == i
+        if finished.any():
+            idx = alive[finished]
+            result[idx] = cur[finished, wlens[idx]]
+
+        # Drop pairs already finished or out of the band (row minimum never decreases)
+        keep = ~finished & (cur[:, lo:hi + 1].min(axis=1) <= k)
+        alive, prev = alive[keep], cur[keep]
+
+    return result
+
+# -----------------------------
+# Vocabulary matrix
+# -----------------------------
+class VocabMatrix:
+    """Vocabulary encoded for batched banded edit-distance scans"""
+
+    # Any radius can be searched; kept for interface parity with the other engines
+    max_distance = float("inf")
+
+    def __init__(self, words):
+        self.words = sorted(words, key=lambda w: (len(w), w))
+        self.lengths = np.array([len(w) for w in self.words], dtype=np.int16)
+        self.width = int(self.lengths.max()) if len(self.words) else 0
+        self.codes = encode(self.words, self.width)
+
+    def _rows(self, length, max_distance):
+        """Contiguous row range of words whose length is within max_distance of length"""
+        start = np.searchsorted(self.lengths, length - max_distance, side="left")
+        end = np.searchsorted(self.lengths, length + max_distance, side="right")
+        return int(start), int(end)
+
+    def lookup(self, word, max_distance=2):
+        """Return all vocabulary words within max_distance of word"""
+        return self.lookup_many([word], max_distance)[0]
+
+    def lookup_many(self, words, max_distance=2):
+        """Return one candidate list per query word, scoring all queries in shared batches"""
+        results = [[] for _ in words]
+        if not words or not self.words:
+            return results
+        qwidth = max(len(w) for w in words)
+        qcodes = encode(words, max(qwidth, 1))
+
+        # Expand queries into (query, vocab row) pairs, flushing every MAX_PAIRS
+        pending_q, pending_w, n_pending = [], [], 0
+        for q, w in enumerate(words):
+            start, end = self._rows(len(w), max_distance)
+            if start == end:
+                continue
+            pending_q.append(np.full(end - start, q))
+            pending_w.append(np.arange(start, end))
+            n_pending += end - start
+            if n_pending >= MAX_PAIRS:
+                self._score(pending_q, pending_w, qcodes, words, max_distance, results)
+                pending_q, pending_w, n_pending = [], [], 0
+        if pending_q:
+            self._score(pending_q, pending_w, qcodes, words, max_distance, results)
+        return results
+
+    def _score(self, pending_q, pending_w, qcodes, words, max_distance, results):
+        q_idx = np.concatenate(pending_q)
+        w_idx = np.concatenate(pending_w)
+        qlens = np.array([len(words[q]) for q in range(len(words))], dtype=np.int16)[q_idx]
+        dist = banded_distances(qcodes[q_idx], qlens, self.codes[w_idx],
+                                self.lengths[w_idx], max_distance)
+        for p in np.flatnonzero(dist <= max_distance):
+            results[q_idx[p]].append(self.words[w_idx[p]])
@@ -0,0 +1,431 @@
+# edit_session.py
+"""
+Incremental re-check of edited text (editor integrations)
+- A CheckSession keeps the text split into sentences, each with its text,
+  tokens, POS tags, lemmas, display grammar and detected errors
+- edit(offset, deleted, inserted) re-segments only the sentences the edit
+  touches, re-tags and re-checks them, and re-checks the first token of the
+  following sentence (its bigram context may have changed); everything else
+  is reused, so the cost of a keystroke follows the size of the edited
+  sentences, not of the document
+- Tagging and display grammar are per sentence (as nltk.pos_tag_sents);
+  detection uses the previous word across sentence boundaries, as
+  detect_errors does on the whole text
+- An edit costs O(edited sentences + CHUNK_SIZE + log sentences), not
+  O(document): sentences are kept in chunks whose sentence, character and
+  token counts are held in Fenwick trees (SentenceList), so a sentence's
+  start offset and first token index are prefix sums, and an edit updates
+  only the chunks it touches. Each sentence keeps its own text; the whole
+  text is joined only when session.text is read
+- Sentences end at a run of whitespace after . ! or ?, or at a line break;
+  boundaries always fall before a non-space character, so tokens never
+  straddle them
+- Error 'index' values are positions in the session's lemma token list
+  (session.lemmas), as in detect_errors
+
+Usage:
+    session = CheckSession(text)
+    session.errors()
+    result = session.edit(offset=120, deleted=3, inserted="the")
+    result["errors"]       # errors of the re-checked sentences
+"""
+
+import re
+
+import metrics
+from corrections import detect_errors_in_tokens
+from user_preprocess import analyze_user_input
+
+# End of a sentence: whitespace after terminal punctuation, or any whitespace run with a newline
+BOUNDARY_PATTERN = re.compile(r'(?:(?<=[.!?])\s+|\s*\n\s*)(?=\S)')
+CHUNK_SIZE = 64  # sentences per SentenceList chunk
+
+# -----------------------------
+# Segmentation
+# -----------------------------
+def sentence_spans(text, start=0, end=None):
+    """(start, end) spans of the sentences in text[start:end] (start and end must be boundaries)"""
+    end = len(text) if end is None else end
+    spans = []
+    for m in BOUNDARY_PATTERN.finditer(text, start, end):
+        spans.append((start, m.end()))
+        start = m.end()
+    if start < end or not spans:
+        spans.append((start, end))
+    return spans
+
+def is_boundary(text, pos):
+    """Whether a sentence starts at pos"""
+    if pos <= 0 or pos >= len(text):
+        return True
+    if text[pos].isspace() or not text[pos - 1].isspace():
+        return False
+    run = pos - 1
+    while run > 0 and text[run - 1].isspace():
+        run -= 1
+    m = BOUNDARY_PATTERN.match(text, run)
+    return m is not None and m.end() == pos
+
+# -----------------------------
+# Sentences
+# -----------------------------
+class Sentence:
+    """One sentence of the session: its text and analysis"""
+
+    __slots__ = ("text", "tokens", "tags", "lemmas",
+                 "display_tokens", "grammar_indices", "grammar_map", "errors")
+
+    def __init__(self, text):
+        self.text = text
+        analysis = analyze_user_input(text)
+        self.tokens, self.tags, self.lemmas = analysis.tokens, analysis.tags, analysis.lemmas
+        self.display_tokens = analysis.display_tokens
+        self.grammar_indices, self.grammar_map = analysis.grammar_indices, analysis.grammar_map
+        self.errors = []  # local token indices
+
+    @property
+    def length(self):
+        return len(self.text)
+
+    def detect(self, prev_word):
+        """(Re)check every token; prev_word is the last lemma before this sentence (or None)"""
+        if prev_word is None:
+            self.errors = detect_errors_in_tokens(self.lemmas)
+            return
+        self.errors = [_shift(err, -1) for err in detect_errors_in_tokens([prev_word] + self.lemmas)
+                       if err['index'] > 0]
+
+    def recheck_first(self, prev_word):
+        """Re-check only the first token, after the word before the sentence changed"""
+        if not self.lemmas:
+            return
+        errors = [err for err in self.errors if err['index'] > 0]
+        tokens = [self.lemmas[0]] if prev_word is None else [prev_word, self.lemmas[0]]
+        first = [_shift(err, 1 - len(tokens)) for err in detect_errors_in_tokens(tokens)
+                 if err['index'] == len(tokens) - 1]
+        self.errors = first + errors
+
+def _shift(err, offset):
+    """Copy of an error dict with its token index moved by offset"""
+    err = dict(err)
+    err['index'] += offset
+    return err
+
+class _Fenwick:
+    """Prefix sums over a list of ints, with O(log n) point updates and searches"""
+
+    def __init__(self, values):
+        self.tree = [0] + list(values)
+        for i in range(1, len(self.tree)):
+            j = i + (i & -i)
+            if j < len(self.tree):
+                self.tree[j] += self.tree[i]
+
+    def add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of the first i values"""
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def search(self, value):
+        """(i, prefix(i)) for the first i with prefix(i + 1) > value (i == len when there is none)"""
+        n = len(self.tree) - 1
+        i, total = 0, 0
+        step = 1 << (n.bit_length() - 1) if n else 0
+        while step:
+            if i + step <= n and total + self.tree[i + step] <= value:
+                i += step
+                total += self.tree[i]
+            step >>= 1
+        return i, total
+
+class SentenceList:
+    """
+    Sentences in chunks of about CHUNK_SIZE, with each chunk's sentence,
+    character and token counts in Fenwick trees: finding a sentence by index
+    or character offset, its start and its first token index cost O(log
+    chunks + CHUNK_SIZE), and replace() updates only the chunks it touches.
+    Chunks are split above 2 * CHUNK_SIZE sentences and merged below half of
+    CHUNK_SIZE, so the trees are rebuilt (O(chunks)) at most once per about
+    CHUNK_SIZE / 2 added or removed sentences.
+    """
+
+    def __init__(self, sentences):
+        sentences = list(sentences)
+        n = max(1, -(-len(sentences) // CHUNK_SIZE))
+        self._rebuild(_split(sentences, n))
+
+    def _rebuild(self, chunks):
+        self.chunks = chunks
+        self.size = sum(len(chunk) for chunk in chunks)
+        self.counts = _Fenwick(len(chunk) for chunk in chunks)
+        self.chars = _Fenwick(sum(s.length for s in chunk) for chunk in chunks)
+        self.tokens = _Fenwick(sum(len(s.lemmas) for s in chunk) for chunk in chunks)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        c, before = self.counts.search(i)
+        return self.chunks[c][i - before]
+
+    def _locate(self, i):
+        """(chunk, position in it) of sentence i; (len(chunks), 0) for i == len"""
+        if not 0 <= i <= self.size:
+            raise IndexError(i)
+        c, before = self.counts.search(i)
+        return c, i - before
+
+    def start(self, i):
+        """Character offset of sentence i"""
+        c, k = self._locate(i)
+        return self.chars.prefix(c) + sum(s.length for s in self.chunks[c][:k]) if k else self.chars.prefix(c)
+
+    def token_offset(self, i):
+        """Index of sentence i's first token in the session's token list"""
+        c, k = self._locate(i)
+        return self.tokens.prefix(c) + sum(len(s.lemmas) for s in self.chunks[c][:k]) if k else self.tokens.prefix(c)
+
+    def find(self, pos):
+        """Index of the sentence containing character pos (the last sentence for pos >= the text length)"""
+        c, chars = self.chars.search(pos)
+        if c == len(self.chunks):
+            return self.size - 1
+        chunk = self.chunks[c]
+        for k, sentence in enumerate(chunk):
+            chars += sentence.length
+            if pos < chars:
+                break
+        return self.counts.prefix(c) + k
+
+    def range(self, first, stop=None):
+        """Sentences first..stop - 1 (to the end when stop is None)"""
+        stop = self.size if stop is None else min(stop, self.size)
+        if first >= stop:
+            return
+        c, k = self._locate(first)
+        remaining = stop - first
+        while remaining > 0:
+            chunk = self.chunks[c][k:k + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            c, k = c + 1, 0
+
+    def before(self, i):
+        """Sentences i - 1, i - 2, ... 0"""
+        if i <= 0:
+            return
+        c, k = self._locate(i - 1)
+        while c >= 0:
+            chunk = self.chunks[c]
+            for j in range(k, -1, -1):
+                yield chunk[j]
+            c -= 1
+            k = len(self.chunks[c]) - 1 if c >= 0 else 0
+
+    def replace(self, first, stop, sentences):
+        """Replace sentences first..stop - 1 (stop > first) with sentences"""
+        c, k = self._locate(first)
+        c_last, k_last = self._locate(stop - 1)
+        merged = self.chunks[c][:k] + list(sentences) + self.chunks[c_last][k_last + 1:]
+        c_stop = c_last + 1
+        n = c_stop - c
+        if not CHUNK_SIZE // 2 * n <= len(merged) <= 2 * CHUNK_SIZE * n:
+            if len(merged) < CHUNK_SIZE // 2 * n and len(self.chunks) > n:
+                # Absorb a neighbour so chunks never shrink without bound
+                if c_stop < len(self.chunks):
+                    merged += self.chunks[c_stop]
+                    c_stop += 1
+                else:
+                    c -= 1
+                    merged = self.chunks[c] + merged
+            n = max(1, -(-len(merged) // CHUNK_SIZE))
+        pieces = _split(merged, n)
+        if n != c_stop - c:
+            self._rebuild(self.chunks[:c] + pieces + self.chunks[c_stop:])
+            return
+        # Same chunk layout: update the totals of the touched chunks only
+        for j, piece in enumerate(pieces, c):
+            old = self.chunks[j]
+            self.size += len(piece) - len(old)
+            self.counts.add(j, len(piece) - len(old))
+            self.chars.add(j, sum(s.length for s in piece) - sum(s.length for s in old))
+            self.tokens.add(j, sum(len(s.lemmas) for s in piece) - sum(len(s.lemmas) for s in old))
+            self.chunks[j] = piece
+
+def _split(items, n):
+    """items cut into n nearly equal consecutive pieces"""
+    return [items[k * len(items) // n:(k + 1) * len(items) // n] for k in range(n)]
+
+# -----------------------------
+# Session
+# -----------------------------
+class CheckSession:
+    """Text plus per-sentence analysis, kept up to date by edit()"""
+
+    def __init__(self, text=""):
+        sentences = [Sentence(text[s:e]) for s, e in sentence_spans(text)]
+        prev_word = None
+        for sentence in sentences:
+            sentence.detect(prev_word)
+            if sentence.lemmas:
+                prev_word = sentence.lemmas[-1]
+        self.sentences = SentenceList(sentences)
+        self.length = len(text)
+        self._text = text
+
+    @property
+    def text(self):
+        """The current text (joined from the sentences on first use after an edit)"""
+        if self._text is None:
+            self._text = "".join(s.text for s in self.sentences)
+        return self._text
+
+    def spans(self):
+        """(start, end) character span of every sentence"""
+        spans, start = [], 0
+        for sentence in self.sentences:
+            spans.append((start, start + sentence.length))
+            start += sentence.length
+        return spans
+
+    def sentence_at(self, pos):
+        """Index of the sentence containing character pos"""
+        return self.sentences.find(pos)
+
+    def _prev_word(self, i):
+        """Last lemma before sentence i (None at the start of the text)"""
+        for sentence in self.sentences.before(i):
+            if sentence.lemmas:
+                return sentence.lemmas[-1]
+        return None
+
+    def token_offset(self, i):
+        """Index in self.lemmas of sentence i's first token"""
+        return self.sentences.token_offset(i)
+
+    def edit(self, offset, deleted=0, inserted=""):
+        """
+        Replace text[offset:offset + deleted] with inserted and re-check the
+        affected sentences. Returns {'sentences': (first, stop), 'removed': n,
+        'retagged': tokens tagged, 'errors': errors of sentences first..stop
+        (plus the next sentence when its first token was re-checked), with
+        session-wide indices}.
+        """
+        length = self.length
+        if not 0 <= offset <= length or deleted < 0 or offset + deleted > length:
+            raise ValueError(f"edit ({offset}, {deleted}) outside a text of length {length}")
+        sentences = self.sentences
+
+        # Window: whole sentences from the one before the edit to the one after it,
+        # widened while its end is no longer a sentence boundary. It starts with a
+        # non-space character (or at 0), so it can be segmented on its own
+        first = sentences.find(max(offset - 1, 0))
+        last = sentences.find(min(offset + deleted, max(length - 1, 0)))
+        start = sentences.start(first)
+        window = "".join(s.text for s in sentences.range(first, last + 1))
+        window = window[:offset - start] + inserted + window[offset - start + deleted:]
+        for sentence in sentences.range(last + 1):
+            if is_boundary(window + sentence.text[:1], len(window)):
+                break
+            window += sentence.text
+            last += 1
+
+        with metrics.timer("session_edit"):
+            new = [Sentence(window[s:e]) for s, e in sentence_spans(window)]
+            removed = last + 1 - first
+            sentences.replace(first, last + 1, new)
+            stop = first + len(new)
+            self.length = length + len(inserted) - deleted
+            self._text = None
+
+            prev_word = self._prev_word(first)
+            for sentence in new:
+                sentence.detect(prev_word)
+                if sentence.lemmas:
+                    prev_word = sentence.lemmas[-1]
+            # The next sentence with tokens now follows a different word
+            report_stop = stop
+            for k, sentence in enumerate(sentences.range(stop), stop):
+                if sentence.lemmas:
+                    sentence.recheck_first(prev_word)
+                    report_stop = k + 1
+                    break
+
+        retagged = sum(len(s.tokens) for s in new)
+        metrics.count("session_retagged_tokens", retagged)
+        return {
+            "sentences": (first, stop),
+            "removed": removed,
+            "retagged": retagged,
+            "errors": self.errors(first, report_stop),
+        }
+
+    def errors(self, first=0, stop=None):
+        """detect_errors-style errors of sentences first..stop, indexed into self.lemmas"""
+        offset = self.token_offset(first)
+        errors = []
+        for sentence in self.sentences.range(first, stop):
+            errors.extend(_shift(err, offset) for err in sentence.errors)
+            offset += len(sentence.lemmas)
+        return errors
+
+    @property
+    def tokens(self):
+        return [t for s in self.sentences for t in s.tokens]
+
+    @property
+    def lemmas(self):
+        return [t for s in self.sentences for t in s.lemmas]
+
+    def display_tokens(self):
+        """display_tokens()-style (tokens, grammar_indices, grammar_map) over the whole text"""
+        tokens, grammar_indices, grammar_map = [], [], {}
+        for sentence in self.sentences:
+            offset = len(tokens)
+            tokens.extend(sentence.display_tokens)
+            grammar_indices.extend(i + offset for i in sentence.grammar_indices)
+            grammar_map.update({i + offset: pair for i, pair in sentence.grammar_map.items()})
+        return tokens, grammar_indices, grammar_map
+
+# -----------------------------
+# Per-keystroke latency against document size
+# -----------------------------
+if __name__ == "__main__":
+    import random
+    import time
+    from corrections import detect_errors, warmup
+    from loadgen import load_sentences
+
+    warmup()
+    rng = random.Random(0)
+    for n_sentences in (10, 100, 1000, 10000):
+        text = ". ".join(load_sentences(n=n_sentences, seed=n_sentences)) + "."
+        session = CheckSession(text)
+        start = time.perf_counter()
+        detect_errors(text)
+        full = time.perf_counter() - start
+
+        timings = []
+        for _ in range(50):
+            offset = rng.randrange(session.length)
+            start = time.perf_counter()
+            session.edit(offset, 0, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{n_sentences:5d} sentences ({len(session.text)} chars): full check {full * 1000:.1f} ms | "
+              f"edit p50 {timings[len(timings) // 2] * 1000:.2f} ms, max {timings[-1] * 1000:.2f} ms")
@@ -0,0 +1,331 @@
+# ingest.py
+"""
+Incremental corpus ingestion
+- Run only the new text through the corpus stages (clean.py → tokenize_text.py)
+- Merge its counts into word_freq.pkl, unigram_counts.pkl and bigram_counts.pkl,
+  including the bigram that joins the old corpus to the new text
+- Recompute vocabulary.txt (freq >= 2) from the merged frequencies
+- Append the new text to data2.txt, cleaned.txt and tokens.txt so the full
+  chain can still be rerun from scratch
+- Model files are written to temp files first (model_bundle.open_temp: with
+  the mode of the files they replace); the corpus appends and the swaps then
+  happen in one commit step under the exclusive model_bundle.source_lock, so
+  a bundle compile sees either all old or all new files. Temp files of an
+  ingest that died before its commit are deleted by the next run
+- The commit step is journaled (ingest.journal: corpus file sizes, temp
+  files, digest of the input). After a crash the next run rolls it back
+  (truncates the appends) or, if the swap had started, finishes it; rerunning
+  the same input after a finished swap is a no-op
+- --verify rebuilds counts and vocabulary from tokens.txt in one pass
+  (build_vocab.py + build_ngrams.py) and checks they equal the files on disk
+
+Usage:
+    python ingest.py new_docs.txt [--workers N]
+    python ingest.py --verify
+
+The new text is tagged on its own, so tokens near the join can differ from a
+full re-tokenization of the concatenated corpus (the tagger sees different
+context there); counts are always exact for the resulting tokens.txt.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import build_ngrams
+import build_vocab
+import clean
+import tokenize_text
+from model_bundle import open_temp, source_lock, stale_temps
+
+PATHS = {
+    "raw": "data2.txt",
+    "cleaned": "cleaned.txt",
+    "tokens": "tokens.txt",
+    "vocabulary": "vocabulary.txt",
+    "word_freq": "word_freq.pkl",
+    "unigram_counts": "unigram_counts.pkl",
+    "bigram_counts": "bigram_counts.pkl",
+    "journal": "ingest.journal",
+}
+CORPUS_FILES = ("raw", "cleaned", "tokens")        # appended in the commit step
+MODEL_FILES = ("word_freq", "unigram_counts", "bigram_counts", "vocabulary")  # replaced
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def _last_token(path):
+    """Last line of tokens.txt without reading the whole file (None if empty/missing)"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 4096))
+            lines = f.read().decode("utf-8", errors="ignore").splitlines()
+    except FileNotFoundError:
+        return None
+    return lines[-1] if lines else None
+
+def _ends_with_space(path):
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1).isspace()
+    except FileNotFoundError:
+        return True
+
+def _write_temp(path, data, binary):
+    """Write data next to path (model_bundle.open_temp, so with path's mode) and return the temp file name"""
+    f, tmp = open_temp(path, "wb" if binary else "w", None if binary else "utf-8")
+    try:
+        with f:
+            if binary:
+                pickle.dump(data, f)
+            else:
+                build_vocab.write_vocabulary(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+def _digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+def _append(path, src):
+    """Append the contents of the open text file src to path"""
+    src.seek(0)
+    with open(path, "a", encoding="utf-8") as dst:
+        while True:
+            chunk = src.read(clean.CHUNK_SIZE)
+            if not chunk:
+                break
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+# -----------------------------
+# Journaled commit
+# -----------------------------
+def _write_journal(paths, journal):
+    tmp = paths["journal"] + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(journal, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, paths["journal"])
+
+def _rollback(paths, journal):
+    """Undo the corpus appends of an unfinished commit and drop its temp files"""
+    for name, size in journal["sizes"].items():
+        if os.path.exists(paths[name]):
+            with open(paths[name], "r+b") as f:
+                f.truncate(size)
+    for tmp in journal["temps"].values():
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+def recover(paths=PATHS):
+    """
+    Finish or undo a commit interrupted by a crash (call with the source lock held),
+    then delete model temp files left by ingests that died before journaling.
+    Returns None (no journal), "rolled back" or the input digest of a commit
+    that was completed.
+    """
+    try:
+        with open(paths["journal"], "r", encoding="utf-8") as f:
+            journal = json.load(f)
+    except FileNotFoundError:
+        outcome = None
+    else:
+        if all(os.path.exists(tmp) for tmp in journal["temps"].values()):
+            _rollback(paths, journal)  # the swap had not started
+            outcome = "rolled back"
+        else:
+            for name, tmp in journal["temps"].items():
+                if os.path.exists(tmp):
+                    os.replace(tmp, paths[name])
+            outcome = journal["digest"]
+        os.unlink(paths["journal"])
+    for name in MODEL_FILES:
+        for tmp in stale_temps(paths[name]):
+            os.unlink(tmp)
+    return outcome
+
+def _commit(paths, new_path, digest, temps, cleaned, tokens_out):
+    """Append the corpus files and swap in the model files, all or nothing"""
+    journal = {"digest": digest, "sizes": {n: _size(paths[n]) for n in CORPUS_FILES}, "temps": temps}
+    _write_journal(paths, journal)
+    try:
+        # Corpus files: raw text (newline keeps the old last word separate),
+        # cleaned text (one line, space separated) and tokens
+        with open(new_path, "r", encoding="utf-8", errors="ignore") as src:
+            with open(paths["raw"], "a", encoding="utf-8") as raw:
+                raw.write("\n")
+                while True:
+                    chunk = src.read(clean.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    raw.write(chunk)
+                raw.flush()
+                os.fsync(raw.fileno())
+        cleaned.seek(0, os.SEEK_END)
+        if cleaned.tell():
+            if not _ends_with_space(paths["cleaned"]):
+                with open(paths["cleaned"], "a", encoding="utf-8") as f:
+                    f.write(" ")
+            _append(paths["cleaned"], cleaned)
+        _append(paths["tokens"], tokens_out)
+    except BaseException:
+        _rollback(paths, journal)
+        os.unlink(paths["journal"])
+        raise
+    # From here on recover() rolls forward
+    for name, tmp in temps.items():
+        os.replace(tmp, paths[name])
+    os.unlink(paths["journal"])
+
+# -----------------------------
+# Ingest
+# -----------------------------
+def ingest(new_path, workers=0, shard_chars=tokenize_text.SHARD_CHARS, paths=PATHS):
+    """Process new_path and merge it into the corpus artifacts; returns the number of new tokens"""
+    digest = _digest(new_path)
+    with source_lock(exclusive=True):
+        if recover(paths) == digest:
+            return 0  # this input was committed by a run that crashed before cleaning up
+        word_freq = _load(paths["word_freq"])
+        unigrams = _load(paths["unigram_counts"])
+        bigrams = _load(paths["bigram_counts"])
+        prev = _last_token(paths["tokens"])
+        tokens_size = _size(paths["tokens"])
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as cleaned, \
+            tempfile.TemporaryFile("w+", encoding="utf-8") as tokens_out:
+        # Stage 1 on the new text only
+        with open(new_path, "r", encoding="utf-8", errors="ignore") as src:
+            clean.clean_stream(src, cleaned)
+        cleaned.seek(0)
+
+        # Stage 2: tag/lemmatize in shards (optionally in a pool)
+        pool = None
+        if workers > 0:
+            pool = Pool(workers, initializer=tokenize_text.init_worker)
+            shards = pool.imap(tokenize_text.process_text, tokenize_text.iter_shards(cleaned, shard_chars))
+        else:
+            tokenize_text.init_worker()
+            shards = map(tokenize_text.process_text, tokenize_text.iter_shards(cleaned, shard_chars))
+
+        def blocks():
+            for block in shards:
+                word_freq.update(block)
+                for token in block:
+                    tokens_out.write(token + "\n")
+                yield block
+
+        # Stages 3-4: merge the delta counts
+        try:
+            _, _, _, n_tokens = build_ngrams.count_ngrams(blocks(), unigrams, bigrams, prev)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        vocab = build_vocab.build_vocabulary(word_freq)
+
+        # Write every model file before touching anything visible
+        temps = {
+            "word_freq": _write_temp(paths["word_freq"], word_freq, True),
+            "unigram_counts": _write_temp(paths["unigram_counts"], unigrams, True),
+            "bigram_counts": _write_temp(paths["bigram_counts"], bigrams, True),
+            "vocabulary": _write_temp(paths["vocabulary"], vocab, False),
+        }
+        try:
+            with source_lock(exclusive=True):
+                if _size(paths["tokens"]) != tokens_size:
+                    raise RuntimeError("tokens.txt changed during the ingest (concurrent ingest?)")
+                _commit(paths, new_path, digest, temps, cleaned, tokens_out)
+        except BaseException:
+            if not os.path.exists(paths["journal"]):  # otherwise the swap started: recover() finishes it
+                for tmp in temps.values():
+                    if os.path.exists(tmp):
+                        os.unlink(tmp)
+            raise
+    return n_tokens
+
+# -----------------------------
+# Rebuild-from-scratch check
+# -----------------------------
+def verify(paths=PATHS):
+    """Rebuild counts and vocabulary from tokens.txt; return a list of mismatching files"""
+    word_freq = Counter()
+
+    def blocks():
+        for block in build_ngrams.iter_token_blocks(paths["tokens"]):
+            word_freq.update(block)
+            yield block
+
+    unigrams, bigrams, _, _ = build_ngrams.count_ngrams(blocks())
+    vocab = build_vocab.build_vocabulary(word_freq)
+
+    mismatches = []
+    # Compare objects, not pickle bytes: the pickler's memo (shared string
+    # objects) differs between runs that produce equal counts
+    for name, rebuilt in (("word_freq", word_freq), ("unigram_counts", unigrams), ("bigram_counts", bigrams)):
+        loaded = _load(paths[name])
+        if loaded != rebuilt or list(loaded.items()) != list(rebuilt.items()):
+            mismatches.append(paths[name])
+    with open(paths["vocabulary"], "rb") as f:
+        if f.read() != "".join(w + "\n" for w in sorted(vocab)).encode("utf-8"):
+            mismatches.append(paths["vocabulary"])
+    return mismatches
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge new text into the corpus models")
+    parser.add_argument("input", nargs="?", help="file with the new documents")
+    parser.add_argument("--workers", type=int, default=0, help="tagging processes (0 = in-process)")
+    parser.add_argument("--shard-chars", type=int, default=tokenize_text.SHARD_CHARS)
+    parser.add_argument("--verify", action="store_true",
+                        help="check the models against a rebuild from tokens.txt")
+    args = parser.parse_args(argv)
+    if not args.input and not args.verify:
+        parser.error("give an input file and/or --verify")
+
+    if args.input:
+        start = time.perf_counter()
+        n_tokens = ingest(args.input, args.workers, args.shard_chars)
+        print(f"Ingested {n_tokens} tokens in {time.perf_counter() - start:.1f}s")
+
+    if args.verify:
+        mismatches = verify()
+        if mismatches:
+            print("Rebuild check FAILED: " + ", ".join(mismatches))
+            sys.exit(1)
+        print("Rebuild check passed: models match a rebuild from tokens.txt")
+
+if __name__ == "__main__":
+    main()
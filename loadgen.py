@@ -0,0 +1,103 @@
+# loadgen.py
+"""
+Local load generator for server.py
+- N client threads, each with its own keep-alive connection, send POST requests
+  with sentences sampled (seeded) from cleaned.txt for a fixed duration
+- Reports throughput, latency percentiles and the server's batching counters
+
+Usage:
+    python loadgen.py --url http://127.0.0.1:8080 --clients 16 --duration 10
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+def load_sentences(path="cleaned.txt", n=2000, seed=0, max_chars=200000):
+    """Sample n short sentences from the start of the cleaned corpus"""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read(max_chars)
+    sentences = [s.strip() for s in re.split(r'[.!?]\s', text) if 3 <= len(s.split()) <= 40]
+    rng = random.Random(seed)
+    return [rng.choice(sentences) for _ in range(n)]
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+def _client(url, endpoint, sentences, stop_at, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    while time.perf_counter() < stop_at:
+        body = json.dumps({"text": rng.choice(sentences)})
+        start = time.perf_counter()
+        try:
+            conn.request("POST", endpoint, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as exc:
+            errors.append(str(exc))
+            conn.close()
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+def run(url, endpoint="/check", clients=8, duration=10.0, seed=0, corpus="cleaned.txt"):
+    """Drive the server for duration seconds; returns a summary dict"""
+    url = urlparse(url)
+    sentences = load_sentences(corpus, seed=seed)
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=_client,
+                                args=(url, endpoint, sentences, stop_at, latencies, errors, seed + i))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    conn.request("GET", "/health")
+    health = json.loads(conn.getresponse().read())
+    conn.close()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "server": health.get("batching", {}),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the local correction server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--endpoint", default="/check", choices=["/check", "/detect", "/display"])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    summary = run(args.url, args.endpoint, args.clients, args.duration, args.seed)
+    print(f"{summary['requests']} requests ({summary['errors']} failed) | "
+          f"{summary['requests_per_sec']:.0f} req/s | p50 {summary['p50_ms']:.1f} ms | "
+          f"p95 {summary['p95_ms']:.1f} ms | p99 {summary['p99_ms']:.1f} ms")
+    print("Server batching: " + json.dumps(summary["server"]))
+
+if __name__ == "__main__":
+    main()
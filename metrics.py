@@ -0,0 +1,161 @@
+# metrics.py
+"""
+Optional per-stage instrumentation
+- Stage timers (tokenize, tag, lemmatize, candidates, rank, detect) and
+  counters (tokens, OOV tokens, candidates returned by the search, real-word checks,
+  cache hits/misses) recorded by user_preprocess.py and corrections.py
+- Off by default: timer() then returns a shared no-op context manager and
+  count() returns immediately, so the cost is one function call per stage
+- Events go to pluggable sinks: any callable sink(kind, name, value) where
+  kind is "timer" (value in seconds) or "counter"
+- The built-in REGISTRY sink aggregates everything and renders it in the
+  Prometheus text exposition format (counters + per-stage histograms)
+- Metrics are per process: pool workers (detect_errors_batch) keep their own
+
+Usage:
+    import metrics
+    metrics.enable()                                  # aggregate into REGISTRY
+    metrics.add_sink(lambda kind, name, value: ...)   # plus a callback
+    ...
+    print(metrics.prometheus_text())
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+PREFIX = "spellcheck"
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+enabled = False
+
+# -----------------------------
+# Aggregating sink
+# -----------------------------
+class Registry:
+    """Thread-safe totals for counters and bucketed timers"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timers = {}  # stage -> [count, sum, per-bucket counts (+Inf last)]
+
+    def __call__(self, kind, name, value):
+        with self._lock:
+            if kind == "counter":
+                self.counters[name] = self.counters.get(name, 0) + value
+            else:
+                timer = self.timers.get(name)
+                if timer is None:
+                    timer = self.timers[name] = [0, 0.0, [0] * (len(self.buckets) + 1)]
+                timer[0] += 1
+                timer[1] += value
+                timer[2][bisect_left(self.buckets, value)] += 1
+
+    def snapshot(self):
+        """{'counters': {name: n}, 'timers': {stage: {'count', 'sum'}}}"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "timers": {name: {"count": t[0], "sum": t[1]} for name, t in self.timers.items()},
+            }
+
+    def prometheus(self, prefix=PREFIX):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted(self.counters):
+                metric = f"{prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+            if self.timers:
+                metric = f"{prefix}_stage_seconds"
+                lines.append(f"# HELP {metric} Time spent in each pipeline stage")
+                lines.append(f"# TYPE {metric} histogram")
+                for name in sorted(self.timers):
+                    count, total, buckets = self.timers[name]
+                    cumulative = 0
+                    for le, n in zip(self.buckets + ("+Inf",), buckets):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{stage="{name}"}} {total!r}')
+                    lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+_sinks = [REGISTRY]
+
+# -----------------------------
+# Configuration
+# -----------------------------
+def enable(*sinks):
+    """Start recording (into REGISTRY and any extra sinks given)"""
+    global enabled
+    for sink in sinks:
+        add_sink(sink)
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def add_sink(sink):
+    """Register a callable sink(kind, name, value)"""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+def prometheus_text():
+    return REGISTRY.prometheus()
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+# -----------------------------
+# Recording
+# -----------------------------
+def _emit(kind, name, value):
+    for sink in _sinks:
+        sink(kind, name, value)
+
+def count(name, n=1):
+    """Add n to counter name"""
+    if enabled:
+        _emit("counter", name, n)
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _emit("timer", self.name, time.perf_counter() - self.start)
+        return False
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_TIMER = _NoTimer()
+
+def timer(name):
+    """Context manager timing one stage (a no-op while disabled)"""
+    return _Timer(name) if enabled else _NO_TIMER
@@ -0,0 +1,504 @@
+# model_bundle.py
+"""
+Compiled model bundle: one versioned binary file, memory-mapped at runtime
+- Replaces loading vocabulary.txt, word_freq.pkl, unigram_counts.pkl and
+  bigram_counts.pkl into separate Python dicts
+- Interned word table: every word gets an integer id (sorted order), with an
+  open-addressing hash index (crc32) for word -> id
+- Word frequencies / unigram counts as uint32 arrays indexed by word id
+  (stored once when the two pickles are identical)
+- Bigram counts as sorted uint64 keys (id1 << 32 | id2) plus uint32 counts
+- The VOCAB trie (DAWG) arrays
+- Everything is read through memoryviews into a read-only mmap, so the pages
+  come from the OS page cache and are shared by every process on the host
+
+File layout:
+    header  : MAGIC, format version (uint32), metadata length (uint32)
+    metadata: JSON (section offsets/types, totals, vocabulary fingerprint,
+              source file sizes/mtimes for staleness checks)
+    sections: raw arrays, each 8-byte aligned
+"""
+
+import json
+import mmap
+from contextlib import contextmanager
+import os
+import pickle
+import stat
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+import dawg
+
+MAGIC = b"SPELLBDL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")
+BUNDLE_PATH = "model.bundle"
+
+SOURCES = {
+    "vocabulary": "vocabulary.txt",
+    "word_freq": "word_freq.pkl",
+    "unigram_counts": "unigram_counts.pkl",
+    "bigram_counts": "bigram_counts.pkl",
+}
+# Readers take it shared while reading SOURCES; ingest.py takes it exclusive
+# while swapping them, so a compile never mixes old and new files
+SOURCES_LOCK = "models.lock"
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no cross-process locking
+    fcntl = None
+
+# -----------------------------
+# Atomic file replacement
+# -----------------------------
+def open_temp(path, mode="wb", encoding=None):
+    """
+    Create a uniquely named file next to path (<name>.<pid>.<random>.tmp) and
+    return (file object, its name). It gets path's permission bits, or the
+    umask default when path does not exist yet.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = f"{os.path.basename(path)}.{os.getpid()}."
+    while True:
+        tmp = os.path.join(directory, prefix + os.urandom(4).hex() + ".tmp")
+        try:
+            # Exclusive create like mkstemp, but 0666 so the kernel applies the umask
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        try:
+            os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        return os.fdopen(fd, mode, encoding=encoding), tmp
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+
+def _running(pid):
+    if pid == os.getpid() or os.name != "posix":  # (os.kill(pid, 0) would end the process on Windows)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+def stale_temps(path):
+    """Temp files that open_temp created next to path in processes no longer running"""
+    directory = os.path.dirname(os.path.abspath(path))
+    prefix = os.path.basename(path) + "."
+    stale = []
+    for name in os.listdir(directory):
+        if not (name.startswith(prefix) and name.endswith(".tmp")):
+            continue
+        pid = name[len(prefix):].partition(".")[0]
+        if pid.isdigit() and not _running(int(pid)):
+            stale.append(os.path.join(directory, name))
+    return stale
+
+def write_atomic(path, data):
+    """Write data to a temp file next to path (open_temp), then rename it over path"""
+    f, tmp = open_temp(path)
+    try:
+        with f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _source_stamps(sources):
+    stamps = {}
+    for name, path in sources.items():
+        st = os.stat(path)
+        stamps[name] = [path, st.st_size, st.st_mtime_ns]
+    return stamps
+
+@contextmanager
+def source_lock(exclusive=False, path=SOURCES_LOCK):
+    """Hold a shared (or exclusive) lock on the model source files"""
+    if fcntl is None:
+        yield
+        return
+    try:
+        f = open(path, "a+b")
+    except OSError:  # read-only deployment: nobody can be swapping the files
+        yield
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _pad(n):
+    return (-n) % 8
+
+def build_word_table(words):
+    """
+    (utf-8 blob, offsets, hash index) for words in id order; the open-addressing
+    index is keyed by crc32 and each slot holds id + 1 (0 = empty)
+    """
+    encoded = [w.encode("utf-8") for w in words]
+    word_offsets = array("I", [0])
+    for b in encoded:
+        word_offsets.append(word_offsets[-1] + len(b))
+    n_slots = 1
+    while n_slots < 2 * max(len(encoded), 1):
+        n_slots *= 2
+    word_hash = array("I", bytes(4 * n_slots))
+    for i, b in enumerate(encoded):
+        slot = zlib.crc32(b) & (n_slots - 1)
+        while word_hash[slot]:
+            slot = (slot + 1) & (n_slots - 1)
+        word_hash[slot] = i + 1
+    return b"".join(encoded), word_offsets, word_hash
+
+def find_word(word, blob, offsets, table):
+    """Id of word in a table from build_word_table (any buffers: arrays or memoryviews), or -1"""
+    b = word.encode("utf-8")
+    mask = len(table) - 1
+    slot = zlib.crc32(b) & mask
+    while True:
+        entry = table[slot]
+        if not entry:
+            return -1
+        i = entry - 1
+        if blob[offsets[i]:offsets[i + 1]] == b:
+            return i
+        slot = (slot + 1) & mask
+
+def pack(magic, version, meta, sections):
+    """
+    Header + JSON metadata + 8-byte aligned sections ({name: (data, typecode)});
+    section offsets are recorded in meta["sections"] relative to meta["data_offset"]
+    """
+    # Section offsets depend on the metadata length, so lay out relative
+    # offsets first and shift them once the metadata size is fixed
+    meta["sections"] = {}
+    blobs = []
+    rel = 0
+    for name, (data, typecode) in sections.items():
+        raw = bytes(data) if isinstance(data, (bytes, bytearray)) else data.tobytes()
+        meta["sections"][name] = [rel, len(raw), typecode]
+        blobs.append(raw + b"\0" * _pad(len(raw)))
+        rel += len(raw) + _pad(len(raw))
+
+    # Reserve slack for the data_offset digits, then pad the metadata to it
+    meta["data_offset"] = 0
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    data_offset = HEADER.size + len(meta_bytes) + 64
+    data_offset += _pad(data_offset)
+    meta["data_offset"] = data_offset
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    meta_bytes += b" " * (data_offset - HEADER.size - len(meta_bytes))
+
+    return HEADER.pack(magic, version, len(meta_bytes)) + meta_bytes + b"".join(blobs)
+
+def unpack_meta(buffer, magic, version):
+    """Validate the header of a packed buffer and return its metadata"""
+    if len(buffer) < HEADER.size:
+        raise ValueError(f"not a {magic.decode()} file (truncated header)")
+    found_magic, found_version, meta_len = HEADER.unpack_from(buffer, 0)
+    if found_magic != magic:
+        raise ValueError(f"not a {magic.decode()} file")
+    if found_version != version:
+        raise ValueError(f"unsupported format version {found_version}")
+    meta = json.loads(bytes(buffer[HEADER.size:HEADER.size + meta_len]))
+    if meta["byteorder"] != sys.byteorder:
+        raise ValueError("file was compiled on a machine with a different byte order")
+    end = max((meta["data_offset"] + offset + length for offset, length, _ in meta["sections"].values()),
+              default=meta["data_offset"])
+    if len(buffer) < end:
+        raise ValueError(f"truncated {magic.decode()} file ({len(buffer)} of {end} bytes)")
+    return meta
+
+def section(view, meta, name):
+    """Typed memoryview of one section of a packed buffer"""
+    offset, length, typecode = meta["sections"][name]
+    start = meta["data_offset"] + offset
+    view = view[start:start + length]
+    return view if typecode == "B" else view.cast(typecode)
+
+# -----------------------------
+# Compile
+# -----------------------------
+def compile_bundle(sources=SOURCES, extra_vocab=()):
+    """Compile the legacy model files into bundle bytes"""
+    with source_lock():
+        with open(sources["vocabulary"], "r", encoding="utf-8") as f:
+            vocab = set(w.lower() for w in f.read().splitlines()) | set(extra_vocab)
+        with open(sources["word_freq"], "rb") as f:
+            word_freq = pickle.load(f)
+        with open(sources["unigram_counts"], "rb") as f:
+            unigram_counts = pickle.load(f)
+        with open(sources["bigram_counts"], "rb") as f:
+            bigram_counts = pickle.load(f)
+        stamps = _source_stamps(sources)
+
+    words = set(word_freq) | set(unigram_counts) | vocab
+    for w1, w2 in bigram_counts:
+        words.add(w1)
+        words.add(w2)
+    words = sorted(words)
+    ids = {w: i for i, w in enumerate(words)}
+
+    # Word table + hash index (slot holds id + 1, 0 = empty)
+    word_blob, word_offsets, word_hash = build_word_table(words)
+
+    freq = array("I", (word_freq.get(w, 0) for w in words))
+    unigram = array("I", (unigram_counts.get(w, 0) for w in words))
+
+    pairs = sorted(((ids[w1] << 32) | ids[w2], c) for (w1, w2), c in bigram_counts.items())
+    bigram_keys = array("Q", (k for k, _ in pairs))
+    bigram_values = array("I", (c for _, c in pairs))
+
+    lexicon = dawg.DAWG(vocab)
+
+    sections = {
+        "words": (word_blob, "B"),
+        "word_offsets": (word_offsets, "I"),
+        "word_hash": (word_hash, "I"),
+        "freq": (freq, "I"),
+        "bigram_keys": (bigram_keys, "Q"),
+        "bigram_counts": (bigram_values, "I"),
+        "dawg_offsets": (lexicon.offsets, "I"),
+        "dawg_labels": (lexicon.labels, "I"),
+        "dawg_targets": (lexicon.targets, "I"),
+        "dawg_final": (bytes(lexicon.final), "B"),
+    }
+    # unigram_counts.pkl is currently a copy of word_freq.pkl: store it once
+    same_unigrams = freq == unigram
+    if not same_unigrams:
+        sections["unigram"] = (unigram, "I")
+
+    meta = {
+        "byteorder": sys.byteorder,
+        "n_words": len(words),
+        "n_freq": sum(1 for c in freq if c),
+        "n_unigram": sum(1 for c in unigram if c),
+        "n_bigrams": len(bigram_keys),
+        "total_unigrams": sum(unigram_counts.values()),
+        "vocab_size": len(lexicon),
+        "vocab_fingerprint": lexicon.fingerprint,
+        "same_unigrams": same_unigrams,
+        "sources": stamps,
+    }
+    return pack(MAGIC, FORMAT_VERSION, meta, sections)
+
+def write_bundle(path=BUNDLE_PATH, sources=SOURCES, extra_vocab=()):
+    """Compile and atomically replace the bundle at path"""
+    data = compile_bundle(sources, extra_vocab)
+    write_atomic(path, data)
+    return data
+
+# -----------------------------
+# Read-only views
+# -----------------------------
+class CountView:
+    """Read-only dict-like view word -> count over a bundle array (0 = absent)"""
+
+    def __init__(self, bundle, counts, size):
+        self._bundle = bundle
+        self._counts = counts
+        self._size = size
+
+    def get(self, word, default=0):
+        i = self._bundle.word_id(word)
+        if i < 0:
+            return default
+        return self._counts[i] or default
+
+    def __getitem__(self, word):
+        count = self.get(word, 0)
+        if not count:
+            raise KeyError(word)
+        return count
+
+    def __contains__(self, word):
+        return bool(self.get(word, 0))
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return (self._bundle.word(i) for i, c in enumerate(self._counts) if c)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (c for c in self._counts if c)
+
+    def items(self):
+        return ((self._bundle.word(i), c) for i, c in enumerate(self._counts) if c)
+
+class BigramView:
+    """Read-only dict-like view (w1, w2) -> count over the sorted id-pair keys"""
+
+    def __init__(self, bundle):
+        self._bundle = bundle
+        self._keys = bundle.section("bigram_keys")
+        self._counts = bundle.section("bigram_counts")
+
+    def get(self, pair, default=0):
+        i1 = self._bundle.word_id(pair[0])
+        if i1 < 0:
+            return default
+        i2 = self._bundle.word_id(pair[1])
+        if i2 < 0:
+            return default
+        return self.get_ids(i1, i2, default)
+
+    def get_ids(self, i1, i2, default=0):
+        key = (i1 << 32) | i2
+        pos = bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return self._counts[pos]
+        return default
+
+    def __getitem__(self, pair):
+        count = self.get(pair, None)
+        if count is None:
+            raise KeyError(pair)
+        return count
+
+    def __contains__(self, pair):
+        return self.get(pair, None) is not None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def items(self):
+        word = self._bundle.word
+        for key, count in zip(self._keys, self._counts):
+            yield (word(key >> 32), word(key & 0xFFFFFFFF)), count
+
+# -----------------------------
+# Bundle
+# -----------------------------
+class ModelBundle:
+    """Models backed by a bundle buffer (an mmap, or bytes when it could not be written)"""
+
+    def __init__(self, buffer):
+        self.meta = unpack_meta(buffer, MAGIC, FORMAT_VERSION)
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+
+        self._words = self.section("words")
+        self._word_offsets = self.section("word_offsets")
+        self._word_hash = self.section("word_hash")
+        self._mask = len(self._word_hash) - 1
+
+        self.total_unigrams = self.meta["total_unigrams"]
+        freq = self.section("freq")
+        unigram = freq if self.meta["same_unigrams"] else self.section("unigram")
+        self.word_freq = CountView(self, freq, self.meta["n_freq"])
+        self.unigram_counts = CountView(self, unigram, self.meta["n_unigram"])
+        self.bigram_counts = BigramView(self)
+        self.vocab = dawg.DAWG.from_buffers(
+            self.section("dawg_offsets"), self.section("dawg_labels"),
+            self.section("dawg_targets"), self.section("dawg_final"),
+            self.meta["vocab_size"], self.meta["vocab_fingerprint"],
+        )
+
+    @classmethod
+    def open(cls, path=BUNDLE_PATH):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm)
+
+    def section(self, name):
+        return section(self._view, self.meta, name)
+
+    def is_stale(self):
+        """True if any source file changed since the bundle was compiled"""
+        for path, size, mtime in self.meta["sources"].values():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # sources may be absent in a deployment that ships only the bundle
+            if st.st_size != size or st.st_mtime_ns != mtime:
+                return True
+        return False
+
+    def word_id(self, word):
+        """Integer id of word, or -1 (find_word inlined: this is on the ranking hot path)"""
+        b = word.encode("utf-8")
+        slot = zlib.crc32(b) & self._mask
+        while True:
+            entry = self._word_hash[slot]
+            if not entry:
+                return -1
+            i = entry - 1
+            if self._words[self._word_offsets[i]:self._word_offsets[i + 1]] == b:
+                return i
+            slot = (slot + 1) & self._mask
+
+    def word(self, i):
+        return bytes(self._words[self._word_offsets[i]:self._word_offsets[i + 1]]).decode("utf-8")
+
+def load_or_build(path=BUNDLE_PATH, sources=SOURCES, extra_vocab=()):
+    """
+    Memory-map the bundle, recompiling it first if it is missing, unreadable or
+    older than its source files. If it cannot be written, the compiled bytes
+    are used directly (no page sharing, but same behaviour).
+    """
+    if os.path.exists(path):
+        try:
+            bundle = ModelBundle.open(path)
+            if not bundle.is_stale():
+                return bundle
+        except (OSError, ValueError, KeyError, struct.error):
+            pass
+    data = None
+    try:
+        data = write_bundle(path, sources, extra_vocab)
+        return ModelBundle.open(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        # not writable, or replaced by a broken file since: use the compiled bytes
+        return ModelBundle(data if data is not None else compile_bundle(sources, extra_vocab))
+
+# -----------------------------
+# Compile from the corpus models and compare cold start
+# -----------------------------
+if __name__ == "__main__":
+    import time
+    from user_preprocess import FUNCTION_WORDS
+
+    data = write_bundle(extra_vocab=FUNCTION_WORDS)
+
+    start = time.perf_counter()
+    with open("vocabulary.txt", "r", encoding="utf-8") as f:
+        legacy_vocab = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS
+    for name in ("word_freq", "unigram_counts", "bigram_counts"):
+        with open(SOURCES[name], "rb") as f:
+            pickle.load(f)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bundle = ModelBundle.open()
+    mapped = time.perf_counter() - start
+
+    legacy_bytes = sum(os.path.getsize(p) for p in SOURCES.values())
+    print(f"Bundle compiled: {BUNDLE_PATH} ({len(data) / 1024:.0f} KiB, sources {legacy_bytes / 1024:.0f} KiB)")
+    print(f"Words: {bundle.meta['n_words']} | Vocabulary: {len(bundle.vocab)} | Bigrams: {len(bundle.bigram_counts)}")
+    print(f"Cold load: pickles {legacy * 1000:.1f} ms | bundle {mapped * 1000:.2f} ms")
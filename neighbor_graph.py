@@ -0,0 +1,182 @@
+# neighbor_graph.py
+"""
+Precomputed confusion sets: every vocabulary word's neighbors within
+edit distance MAX_DISTANCE, with their distances
+- Real-word errors are always vocabulary words, so their candidates never
+  change between requests; looking them up here is a dict hit plus a slice
+  instead of a candidate search
+- Stored as flat typed arrays (CSR): row offsets, neighbor rows, uint8 distances;
+  the words themselves are a crc32 word table (model_bundle.build_word_table),
+  so the loaded graph is a handful of buffers rather than ~100k str objects
+- Built offline in a process pool: the parent builds (or maps) the flat
+  SymSpell index once and the workers only reopen it, each querying a slice
+  of the vocabulary
+- Cached on disk with the vocabulary fingerprint and rebuilt when it changes
+"""
+
+import multiprocessing
+import os
+import pickle
+from array import array
+from multiprocessing import Pool
+
+import symspell
+from model_bundle import build_word_table, find_word
+from symspell import vocab_fingerprint
+
+MAX_DISTANCE = 2
+GRAPH_PATH = "neighbors.pkl"
+CHUNK_WORDS = 256
+
+# -----------------------------
+# Parallel build
+# -----------------------------
+_index = None
+
+def _init_worker(source):
+    """source: the flat index's file path, or its bytes (FlatSymSpellIndex.source())"""
+    global _index
+    if isinstance(source, str):
+        _index = symspell.FlatSymSpellIndex.open(source)
+    else:
+        _index = symspell.FlatSymSpellIndex(source)
+
+def _neighbors(args):
+    """Rows of (neighbor, distance) sorted by (distance, word), the word itself excluded"""
+    words, max_distance = args
+    rows = []
+    for word in words:
+        pairs = [(d, cand) for cand, d in _index.lookup_distances(word, max_distance) if cand != word]
+        pairs.sort()
+        rows.append(pairs)
+    return rows
+
+# -----------------------------
+# Graph
+# -----------------------------
+class NeighborGraph:
+    """Vocabulary word -> [(neighbor, distance)] within max_distance"""
+
+    def __init__(self, words, max_distance=MAX_DISTANCE, workers=None):
+        words = sorted(set(words))
+        self.fingerprint = vocab_fingerprint(words)
+        self.max_distance = max_distance
+        self._words, self._word_offsets, self._word_hash = build_word_table(words)
+        row_of = {w: i for i, w in enumerate(words)}
+
+        chunks = [(words[i:i + CHUNK_WORDS], max_distance) for i in range(0, len(words), CHUNK_WORDS)]
+        workers = workers or os.cpu_count() or 1
+        if multiprocessing.current_process().daemon:
+            workers = 1  # pool workers cannot start a pool of their own
+        # Build the index here, before the pool exists: workers never write it
+        index = symspell.load_or_build_flat(words, max_distance=max_distance)
+        if workers == 1:
+            global _index
+            _index = index
+            results = map(_neighbors, chunks)
+        else:
+            pool = Pool(workers, initializer=_init_worker, initargs=(index.source(),))
+            results = pool.imap(_neighbors, chunks)
+
+        self.offsets = array("I", [0])  # row i's neighbors are offsets[i]:offsets[i + 1]
+        self.targets = array("I")       # neighbor rows
+        self.distances = array("B")
+        try:
+            for rows in results:
+                for pairs in rows:
+                    for d, cand in pairs:
+                        self.targets.append(row_of[cand])
+                        self.distances.append(d)
+                    self.offsets.append(len(self.targets))
+        finally:
+            if workers != 1:
+                pool.close()
+                pool.join()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __contains__(self, word):
+        return self.row(word) >= 0
+
+    def row(self, word):
+        """Row of word, or -1"""
+        return find_word(word, self._words, self._word_offsets, self._word_hash)
+
+    def word(self, row):
+        return self._words[self._word_offsets[row]:self._word_offsets[row + 1]].decode("utf-8")
+
+    def _row_neighbors(self, row, max_distance):
+        words, word_offsets, targets, distances = self._words, self._word_offsets, self.targets, self.distances
+        result = []
+        for e in range(self.offsets[row], self.offsets[row + 1]):
+            d = distances[e]
+            if d > max_distance:
+                break
+            t = targets[e]
+            result.append((words[word_offsets[t]:word_offsets[t + 1]].decode("utf-8"), d))
+        return result
+
+    def neighbors(self, word, max_distance=MAX_DISTANCE):
+        """[(neighbor, distance)] sorted by distance, then word; [] for unknown words"""
+        row = self.row(word)
+        return [] if row < 0 else self._row_neighbors(row, max_distance)
+
+    def lookup(self, word, max_distance=MAX_DISTANCE):
+        """Same words as a candidate search for a vocabulary word: itself plus its neighbors"""
+        row = self.row(word)
+        if row < 0:
+            return []
+        return [word] + [w for w, _ in self._row_neighbors(row, max_distance)]
+
+    def save(self, path=GRAPH_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path=GRAPH_PATH):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+def load_or_build(words, path=GRAPH_PATH, max_distance=MAX_DISTANCE, workers=None):
+    """Load the graph from disk if it matches words, otherwise build (in parallel) and save it"""
+    fingerprint = vocab_fingerprint(words)
+    if os.path.exists(path):
+        try:
+            graph = NeighborGraph.load(path)
+            # graphs pickled before the word table (no _words) are rebuilt
+            if (graph.fingerprint == fingerprint and graph.max_distance >= max_distance
+                    and hasattr(graph, "_words")):
+                return graph
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    graph = NeighborGraph(words, max_distance, workers)
+    try:
+        graph.save(path)
+    except OSError:
+        pass  # read-only deployment: keep the in-memory graph
+    return graph
+
+# -----------------------------
+# Build from the corpus vocabulary
+# -----------------------------
+if __name__ == "__main__":
+    import argparse
+    import time
+    from user_preprocess import FUNCTION_WORDS
+
+    parser = argparse.ArgumentParser(description="Precompute the vocabulary neighbor graph")
+    parser.add_argument("--workers", type=int, default=None, help="build processes (default: all cores)")
+    args = parser.parse_args()
+
+    with open("vocabulary.txt", "r", encoding="utf-8") as f:
+        vocab = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS
+
+    start = time.perf_counter()
+    graph = NeighborGraph(vocab, workers=args.workers)
+    graph.save()
+    elapsed = time.perf_counter() - start
+    edges = len(graph.targets)
+    size = sum(a.itemsize * len(a) for a in (graph.offsets, graph.targets, graph.distances))
+    print(f"Neighbor graph built in {elapsed:.1f}s. Words: {len(graph)} | Edges: {edges} | "
+          f"Arrays: {size / 1024:.0f} KiB | Mean neighbors: {edges / max(len(graph), 1):.1f}")
@@ -0,0 +1,290 @@
+# ngram_store.py
+"""
+Compact n-gram language-model store (orders 1-3), memory-mapped from disk
+- Words are interned into ids with the same crc32 word table as model.bundle
+- Unigram counts: exact uint32 array indexed by word id
+- Bigrams / trigrams: open-addressing hash tables (linear probing, load
+  factor MAX_LOAD) whose uint64 keys pack (id + 1) of each word in ID_BITS
+  bits, with uint8 count codes alongside
+- Counts are quantized through a 256-entry codebook: 1..128 exactly, larger
+  counts on a geometric scale up to the maximum (relative error reported at build)
+- Same container layout as model.bundle (header, JSON metadata, aligned
+  sections), so everything is read through memoryviews into an mmap and the
+  Python heap holds almost nothing
+- Answers bigram_prob_laplace-style queries for any order:
+      P(wn | w1..wn-1) = (count(w1..wn) + 1) / (count(w1..wn-1) + V)
+  where V defaults to the runtime vocabulary size (len(VOCAB) in
+  corrections.py: vocabulary.txt plus the function words), recorded at build
+
+Usage:
+    python ngram_store.py                      # build ngrams.store (order 3) from tokens.txt
+    python ngram_store.py --order 2 -o bigrams.store
+"""
+
+import mmap
+import os
+import pickle
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+import build_ngrams
+from model_bundle import build_word_table, find_word, pack, section, unpack_meta, write_atomic
+
+MAGIC = b"SPELLNGM"
+FORMAT_VERSION = 1
+STORE_PATH = "ngrams.store"
+MAX_ORDER = 3
+ID_BITS = 21              # up to 2M words; 3 * 21 bits fit a uint64 key
+MAX_LOAD = 0.8
+EXACT_COUNTS = 128        # counts 1..EXACT_COUNTS are stored without error
+GOLDEN = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+
+# -----------------------------
+# Keys, hashing and quantization
+# -----------------------------
+def pack_key(ids):
+    key = 0
+    for i in ids:
+        key = (key << ID_BITS) | (i + 1)
+    return key
+
+def _slot(key, n_slots):
+    """Multiplicative hash mapped onto [0, n_slots) without a modulo"""
+    return (((key * GOLDEN) & MASK64) * n_slots) >> 64
+
+def make_codebook(max_count):
+    """256 increasing counts: exact up to EXACT_COUNTS, then geometric up to max_count"""
+    codebook = list(range(1, EXACT_COUNTS + 1))
+    steps = 256 - EXACT_COUNTS
+    if max_count > EXACT_COUNTS:
+        ratio = (max_count / (EXACT_COUNTS + 1)) ** (1 / (steps - 1))
+        for k in range(steps):
+            codebook.append(max(codebook[-1] + 1, round((EXACT_COUNTS + 1) * ratio ** k)))
+    else:
+        codebook.extend(range(EXACT_COUNTS + 1, 256 + 1))
+    return array("I", codebook)
+
+def quantize(count, codebook):
+    """Code of the codebook entry closest to count (in relative terms)"""
+    i = bisect_left(codebook, count)
+    if i == 0:
+        return 0
+    if i == len(codebook):
+        return len(codebook) - 1
+    lo, hi = codebook[i - 1], codebook[i]
+    return i if hi * lo <= count * count else i - 1  # geometric midpoint
+
+def build_table(counts, codebook):
+    """(keys, codes) open-addressing arrays for {packed key: count}"""
+    n_slots = max(1, int(len(counts) / MAX_LOAD) + 1)
+    keys = array("Q", bytes(8 * n_slots))
+    codes = array("B", bytes(n_slots))
+    for key, count in counts.items():
+        slot = _slot(key, n_slots)
+        while keys[slot]:
+            slot = slot + 1 if slot + 1 < n_slots else 0
+        keys[slot] = key
+        codes[slot] = quantize(count, codebook)
+    return keys, codes
+
+# -----------------------------
+# Build
+# -----------------------------
+def count_ngrams(path="tokens.txt", order=MAX_ORDER, block_lines=build_ngrams.BLOCK_LINES):
+    """
+    Two streaming passes over tokens.txt.
+    Returns (words, unigram Counter {id: count}, {n: Counter {packed key: count}}).
+    """
+    words = set()
+    for block in build_ngrams.iter_token_blocks(path, block_lines):
+        words.update(block)
+    words = sorted(words)
+    if len(words) >= 1 << ID_BITS:
+        raise ValueError(f"{len(words)} words do not fit in {ID_BITS}-bit ids")
+    ids = {w: i for i, w in enumerate(words)}
+
+    unigrams = Counter()
+    ngrams = {n: Counter() for n in range(2, order + 1)}
+    carry = []  # last order - 1 ids of the previous block
+    for block in build_ngrams.iter_token_blocks(path, block_lines):
+        block_ids = [ids[w] for w in block]
+        unigrams.update(block_ids)
+        seq = carry + block_ids
+        for n, counter in ngrams.items():
+            # only n-grams that end inside this block (the rest were counted before)
+            tail = seq[max(0, len(carry) - (n - 1)):]
+            counter.update(pack_key(gram) for gram in zip(*(tail[k:] for k in range(n))))
+        carry = seq[-(order - 1):] if order > 1 else []
+    return words, unigrams, ngrams
+
+def runtime_vocab_size(vocabulary="vocabulary.txt"):
+    """len(VOCAB) as corrections.py sees it: vocabulary.txt plus the function words"""
+    from user_preprocess import FUNCTION_WORDS
+    with open(vocabulary, "r", encoding="utf-8") as f:
+        return len(set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS)
+
+def compile_store(path="tokens.txt", order=MAX_ORDER, vocab_size=None):
+    """
+    Build the store from tokens.txt; returns (bytes, quantization stats).
+    vocab_size is the smoothing V (default: runtime_vocab_size()).
+    """
+    if not 1 <= order <= MAX_ORDER:
+        raise ValueError(f"order must be between 1 and {MAX_ORDER}")
+    words, unigrams, ngrams = count_ngrams(path, order)
+    word_blob, word_offsets, word_hash = build_word_table(words)
+    max_count = max((max(c.values()) for c in ngrams.values() if c), default=1)
+    codebook = make_codebook(max_count)
+
+    sections = {
+        "words": (word_blob, "B"),
+        "word_offsets": (word_offsets, "I"),
+        "word_hash": (word_hash, "I"),
+        "unigram": (array("I", (unigrams[i] for i in range(len(words)))), "I"),
+        "codebook": (codebook, "I"),
+    }
+    stats = {}
+    for n, counts in ngrams.items():
+        keys, codes = build_table(counts, codebook)
+        sections[f"keys{n}"] = (keys, "Q")
+        sections[f"codes{n}"] = (codes, "B")
+        errors = [abs(codebook[quantize(c, codebook)] - c) / c for c in counts.values()]
+        stats[n] = {
+            "ngrams": len(counts),
+            "slots": len(keys),
+            "exact": sum(1 for e in errors if e == 0),
+            "max_rel_error": max(errors, default=0.0),
+        }
+
+    meta = {
+        "byteorder": sys.byteorder,
+        "order": order,
+        "n_words": len(words),
+        "vocab_size": runtime_vocab_size() if vocab_size is None else vocab_size,
+        "total_unigrams": sum(unigrams.values()),
+        "n_ngrams": {str(n): s["ngrams"] for n, s in stats.items()},
+    }
+    return pack(MAGIC, FORMAT_VERSION, meta, sections), stats
+
+def write_store(out=STORE_PATH, path="tokens.txt", order=MAX_ORDER, vocab_size=None):
+    """Compile and atomically replace the store at out"""
+    data, stats = compile_store(path, order, vocab_size)
+    write_atomic(out, data)
+    return data, stats
+
+# -----------------------------
+# Store
+# -----------------------------
+class NGramStore:
+    """Read-only n-gram counts over a store buffer (an mmap or bytes)"""
+
+    def __init__(self, buffer):
+        self.meta = unpack_meta(buffer, MAGIC, FORMAT_VERSION)
+        self._buffer = buffer
+        view = memoryview(buffer)
+        self.order = self.meta["order"]
+        self.n_words = self.meta["n_words"]
+        self.vocab_size = self.meta.get("vocab_size", self.n_words)  # stores built before it was recorded
+        self.total_unigrams = self.meta["total_unigrams"]
+        self._words = section(view, self.meta, "words")
+        self._word_offsets = section(view, self.meta, "word_offsets")
+        self._word_hash = section(view, self.meta, "word_hash")
+        self._unigram = section(view, self.meta, "unigram")
+        self._codebook = section(view, self.meta, "codebook")
+        self._tables = {
+            n: (section(view, self.meta, f"keys{n}"), section(view, self.meta, f"codes{n}"))
+            for n in range(2, self.order + 1)
+        }
+
+    @classmethod
+    def open(cls, path=STORE_PATH):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm)
+
+    def word_id(self, word):
+        """Integer id of word, or -1"""
+        return find_word(word, self._words, self._word_offsets, self._word_hash)
+
+    def count_ids(self, ids):
+        """(Quantized) count of the n-gram of word ids; 0 if absent"""
+        if len(ids) == 1:
+            return self._unigram[ids[0]]
+        keys, codes = self._tables[len(ids)]
+        key = pack_key(ids)
+        n_slots = len(keys)
+        slot = _slot(key, n_slots)
+        while True:
+            found = keys[slot]
+            if found == key:
+                return self._codebook[codes[slot]]
+            if not found:
+                return 0
+            slot = slot + 1 if slot + 1 < n_slots else 0
+
+    def count(self, *words):
+        """count(w1, ..., wn) for 1 <= n <= order"""
+        if not 1 <= len(words) <= self.order:
+            raise ValueError(f"store holds orders 1..{self.order}, got {len(words)} words")
+        ids = [self.word_id(w.lower()) for w in words]
+        if min(ids) < 0:
+            return 0
+        return self.count_ids(ids)
+
+    def prob_laplace(self, *words, vocab_size=None):
+        """
+        P(wn | w1..wn-1) with add-one smoothing, as bigram_prob_laplace for two
+        words (up to count quantization); vocab_size defaults to the runtime
+        vocabulary size recorded at build
+        """
+        if len(words) < 2:
+            raise ValueError("need a context and a word")
+        vocab_size = self.vocab_size if vocab_size is None else vocab_size
+        return (self.count(*words) + 1) / (self.count(*words[:-1]) + vocab_size)
+
+    def size(self, order):
+        """Number of distinct n-grams of the given order"""
+        if order == 1:
+            return self.n_words
+        return self.meta["n_ngrams"][str(order)]
+
+# -----------------------------
+# Build from tokens.txt and compare memory with the pickled dict
+# -----------------------------
+if __name__ == "__main__":
+    import argparse
+    import time
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Build the n-gram store from tokens.txt")
+    parser.add_argument("--tokens", default="tokens.txt")
+    parser.add_argument("--order", type=int, default=MAX_ORDER)
+    parser.add_argument("-o", "--output", default=STORE_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data, stats = write_store(args.output, args.tokens, args.order)
+    print(f"Built {args.output} in {time.perf_counter() - start:.1f}s ({len(data) / 1024:.0f} KiB)")
+
+    tracemalloc.start()
+    store = NGramStore.open(args.output)
+    store_heap = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    meta = store.meta["sections"]
+    for n, s in stats.items():
+        table_bytes = meta[f"keys{n}"][1] + meta[f"codes{n}"][1]
+        print(f"Order {n}: {s['ngrams']} n-grams | {table_bytes / s['ngrams']:.1f} bytes/n-gram | "
+              f"exact counts {s['exact']}/{s['ngrams']} | "
+              f"max relative error {s['max_rel_error']:.2%}")
+    print(f"Python heap after opening the store: {store_heap / 1024:.0f} KiB")
+
+    if os.path.exists("bigram_counts.pkl"):
+        tracemalloc.start()
+        with open("bigram_counts.pkl", "rb") as f:
+            bigram_counts = pickle.load(f)
+        dict_heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"bigram_counts.pkl dict: {len(bigram_counts)} bigrams | "
+              f"{dict_heap / len(bigram_counts):.1f} bytes/bigram on the heap ({dict_heap / 1024:.0f} KiB)")
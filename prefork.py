@@ -0,0 +1,235 @@
+# prefork.py
+"""
+Pre-fork correction server: load the models once, fork N workers that share them
+- The parent warms everything up (model.bundle, candidate index, neighbor
+  graph, bigram matrix, tagger), binds the listening socket and forks
+  --workers children that run server.CorrectionServer on the inherited socket;
+  the kernel spreads incoming connections over them
+- Shared state is kept out of refcounted Python objects so that reading it
+  never writes to a shared page: model.bundle and symspell_flat.idx (the
+  "symspell_flat" candidate engine, selected here; single-process callers
+  keep the faster dict index) are memory-mapped files, the bigram matrix and neighbor graph are numpy / typed
+  array buffers. Before forking the parent collects garbage and gc.freeze()s
+  what is left, so the cyclic collector in the workers does not touch it either
+- What a worker does add: its own result caches (see CACHE_SIZE in
+  corrections.py), per-request objects and the POS tagger's weight dicts
+  (NLTK objects, refcounted on every lookup)
+- The parent restarts workers that exit and reports per-worker memory (RSS,
+  PSS, private dirty pages from /proc/<pid>/smaps_rollup) every
+  --report-interval seconds; --measure drives the workers with loadgen.py and
+  prints how much private memory each one added
+- Needs os.fork (Linux / macOS); memory figures need /proc (Linux)
+
+Usage:
+    python prefork.py --workers 4 --port 8080
+    python prefork.py --workers 4 --measure 20    # load for 20 s, report memory, exit
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import corrections
+from corrections import warmup
+from server import MAX_BATCH, MAX_WAIT, CorrectionServer
+
+MEMORY_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+RESTART_DELAY = 1.0  # seconds between restarts of a crashing worker
+SHARED_ENGINE = "symspell_flat"  # candidate engine whose index lives outside the Python heap
+
+# -----------------------------
+# Memory accounting
+# -----------------------------
+def memory(pid="self"):
+    """{field: KiB} from /proc/<pid>/smaps_rollup (VmRSS only where that is missing); {} without /proc"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                return {"Rss": int(line.split()[1]) for line in f if line.startswith("VmRSS:")}
+        except OSError:
+            return {}
+    usage = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name in MEMORY_FIELDS:
+            usage[name] = int(value.split()[0])
+    return usage
+
+def format_memory(usage):
+    return " | ".join(f"{name} {usage[name] / 1024:.1f} MiB" for name in MEMORY_FIELDS if name in usage)
+
+# -----------------------------
+# Workers
+# -----------------------------
+def _serve(listen_socket, max_batch, max_wait, verbose):
+    """Worker body: serve on the inherited socket until SIGTERM"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the parent
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = CorrectionServer(listen_socket.getsockname(), max_batch, max_wait, verbose,
+                              listen_socket=listen_socket)
+    server.serve_forever()
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+class PreforkServer:
+    """Parent process: owns the listening socket and supervises the workers"""
+
+    def __init__(self, address, workers=2, max_batch=MAX_BATCH, max_wait=MAX_WAIT, verbose=False,
+                 engine=SHARED_ENGINE):
+        self.n_workers = workers
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.verbose = verbose
+        self.socket = socket.create_server(address, backlog=128)
+        self.address = self.socket.getsockname()
+        self.workers = {}  # pid -> (slot, start time)
+        self._stopping = False
+
+    def prepare(self, warm=True):
+        """Load everything in the parent, then move it out of the collector's reach"""
+        corrections.CANDIDATE_ENGINE = self.engine
+        timings = warmup() if warm else {}
+        gc.collect()
+        gc.freeze()  # objects that exist now are never scanned (or written) by the GC again
+        return timings
+
+    def spawn(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve(self.socket, self.max_batch, self.max_wait, self.verbose)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)  # never run the parent's cleanup in a worker
+        self.workers[pid] = (slot, time.monotonic())
+        return pid
+
+    def start(self):
+        for slot in range(self.n_workers):
+            self.spawn(slot)
+
+    def reap(self):
+        """Restart workers that exited; returns the number restarted"""
+        restarted = 0
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            slot, started = self.workers.pop(pid, (None, 0.0))
+            if slot is None or self._stopping:
+                continue
+            print(f"Worker {slot} (pid {pid}) exited with status {status}; restarting", file=sys.stderr)
+            if time.monotonic() - started < RESTART_DELAY:
+                time.sleep(RESTART_DELAY)
+            self.spawn(slot)
+            restarted += 1
+        return restarted
+
+    def report(self):
+        """[(slot, pid, memory(pid))] for the running workers, by slot"""
+        return sorted((slot, pid, memory(pid)) for pid, (slot, _) in self.workers.items())
+
+    def serve(self, report_interval=0.0):
+        """Supervise until SIGINT / SIGTERM"""
+        signal.signal(signal.SIGTERM, _interrupt)
+        next_report = time.monotonic() + report_interval
+        try:
+            while True:
+                self.reap()
+                if report_interval and time.monotonic() >= next_report:
+                    for slot, pid, usage in self.report():
+                        print(f"worker {slot} pid {pid}: {format_memory(usage)}")
+                    next_report = time.monotonic() + report_interval
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.workers.clear()
+        self.socket.close()
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def measure(server, duration, clients, endpoint="/check"):
+    """Drive the workers with loadgen and print each one's added private memory"""
+    import loadgen
+
+    time.sleep(0.5)
+    before = {pid: usage for _, pid, usage in server.report()}
+    parent = memory()
+    host, port = server.address[:2]
+    summary = loadgen.run(f"http://{host}:{port}", endpoint, clients, duration)
+    print(f"{summary['requests']} requests ({summary['errors']} failed) | "
+          f"{summary['requests_per_sec']:.0f} req/s | p50 {summary['p50_ms']:.1f} ms | "
+          f"p99 {summary['p99_ms']:.1f} ms")
+    print(f"parent: {format_memory(parent)}")
+    added = []
+    for slot, pid, usage in server.report():
+        start = before.get(pid, {})
+        grown = usage.get("Private_Dirty", 0) - start.get("Private_Dirty", 0)
+        added.append(grown)
+        print(f"worker {slot} pid {pid}: {format_memory(usage)} | "
+              f"private dirty added under load {grown / 1024:.1f} MiB")
+    if added:
+        print(f"Mean private memory added per worker: {sum(added) / len(added) / 1024:.1f} MiB")
+    return added
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve corrections from N forked workers sharing one model load")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="texts per micro-batch (per worker)")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--engine", default=SHARED_ENGINE, choices=sorted(set(corrections.ENGINE_BUILDERS) - {"neighbors"}),
+                        help="candidate engine (default: the memory-mapped SymSpell index)")
+    parser.add_argument("--report-interval", type=float, default=0.0,
+                        help="print per-worker memory every N seconds (0: never)")
+    parser.add_argument("--measure", type=float, default=0.0, metavar="SECONDS",
+                        help="run loadgen for SECONDS, print per-worker memory growth and exit")
+    parser.add_argument("--clients", type=int, default=16, help="loadgen clients for --measure")
+    args = parser.parse_args(argv)
+
+    server = PreforkServer((args.host, args.port), args.workers, args.max_batch,
+                           args.max_wait_ms / 1000, args.verbose, args.engine)
+    timings = server.prepare()
+    print("Warm-up: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items()))
+    server.start()
+    print(f"Serving on http://{args.host}:{server.address[1]} with {args.workers} workers "
+          f"(parent pid {os.getpid()})")
+    if args.measure:
+        try:
+            measure(server, args.measure, args.clients)
+        finally:
+            server.stop()
+    else:
+        server.serve(args.report_interval)
+
+if __name__ == "__main__":
+    main()
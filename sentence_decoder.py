@@ -0,0 +1,162 @@
+# sentence_decoder.py
+"""
+Sentence-level correction: beam search over a correction lattice
+- detect_errors picks each suggestion against the uncorrected previous word;
+  here every flagged token gets a slot in a lattice (itself + its top
+  candidates) and whole paths are scored, so adjacent fixes see each other
+- Path score = sum of log P(w | previous content word) from the bigram model,
+  interpolated with the unigram model (Laplace on both), minus EDIT_PENALTY
+  per edit from the original token
+- Function words are fixed and transparent: tokens.txt has stopwords removed,
+  so the context of a word is the last content word before it
+- Hypotheses ending in the same word are merged (only the best can win) and
+  at most beam_width survive each position: cost is O(tokens x beam x options)
+"""
+
+import numpy as np
+from nltk.metrics.distance import edit_distance
+
+from corrections import MODELS, FUNCTION_WORDS, detect_errors_in_tokens, generate_candidates
+from user_preprocess import analyze_user_input
+
+BEAM_WIDTH = 8
+CANDIDATES = 8        # context-free candidates per flagged token (plus detect_errors' suggestions)
+INTERPOLATION = 0.7   # weight of the bigram term against the unigram term
+EDIT_PENALTY = 2.0    # log-score cost of each edit away from the original token
+
+# -----------------------------
+# Lattice
+# -----------------------------
+def build_lattice(tokens, errors=None):
+    """
+    One slot per token: (options, edit distances). Function words are None
+    (fixed and skipped by the scorer), unflagged tokens have just themselves.
+    Non-words are only kept as an option when they have no candidates (Laplace
+    smoothing would otherwise score them like any unseen vocabulary word).
+    """
+    m = MODELS.ensure_loaded()
+    if errors is None:
+        errors = detect_errors_in_tokens(tokens)
+    flagged = {err['index']: err for err in errors}
+
+    lattice = []
+    for i, token in enumerate(tokens):
+        token_lc = token.lower()
+        if token_lc in FUNCTION_WORDS:
+            lattice.append(None)
+            continue
+        options = [token_lc]
+        if i in flagged:
+            ranked = m.bigram_matrix.rank(generate_candidates(token_lc), None, k=CANDIDATES)
+            for w in flagged[i]['suggestions'] + ranked:
+                if w not in options:
+                    options.append(w)
+            if flagged[i]['type'] == 'non-word' and len(options) > 1:
+                options.pop(0)
+        lattice.append((options, [edit_distance(token_lc, w) for w in options]))
+    return lattice
+
+# -----------------------------
+# Search
+# -----------------------------
+def beam_search(lattice, beam_width=BEAM_WIDTH):
+    """
+    Best option per slot (None for fixed function words) and its path score.
+    """
+    if beam_width < 1:
+        raise ValueError(f"beam_width must be at least 1, got {beam_width}")
+    m = MODELS.ensure_loaded()
+    bm = m.bigram_matrix
+    vocab_size = m.vocab_size
+    unigram_denominator = bm.total_unigrams + vocab_size
+
+    # Beam entries: (score, last word id, backpointer (option index, parent backpointer))
+    beam = [(0.0, -1, None)]  # -1: sentence start or unknown word (unigram only)
+    scored = False
+    for slot in lattice:
+        if slot is None:
+            continue
+        options, distances = slot
+        ids = bm.ids(options)
+        unigram = bm.gather(bm.unigram, ids)
+        p_unigram = (unigram + 1) / unigram_denominator
+        channel = -EDIT_PENALTY * np.asarray(distances, dtype=np.float64)
+
+        best = {}  # option index -> (score, parent)
+        for score, prev_id, back in beam:
+            if prev_id < 0:
+                p = p_unigram
+            else:
+                p = INTERPOLATION * bm.prob_laplace(prev_id, ids) + (1 - INTERPOLATION) * p_unigram
+            scores = score + np.log(p) + channel
+            for j, s in enumerate(scores.tolist()):
+                if j not in best or s > best[j][0]:
+                    best[j] = (s, back)
+
+        survivors = sorted(best.items(), key=lambda item: -item[1][0])[:beam_width]
+        beam = [(s, int(ids[j]), (j, back)) for j, (s, back) in survivors]
+        scored = True
+
+    if not scored:
+        return [None] * len(lattice), 0.0
+    score, _, entry = max(beam, key=lambda state: state[0])
+    choices = []
+    while entry is not None:
+        choices.append(entry[0])
+        entry = entry[1]
+    choices.reverse()
+
+    path = []
+    k = 0
+    for slot in lattice:
+        if slot is None:
+            path.append(None)
+        else:
+            path.append(slot[0][choices[k]])
+            k += 1
+    return path, score
+
+# -----------------------------
+# Sentence-level detection
+# -----------------------------
+def detect_errors_sentence(user_text, beam_width=BEAM_WIDTH):
+    """
+    detect_errors with the suggestions re-ranked by the best whole-sentence path.
+    Each error gets 'correction': the word chosen by the decoder (the token
+    itself if keeping it scored best), listed first in 'suggestions'.
+    user_text may be a string or a TextAnalysis.
+    """
+    tokens = analyze_user_input(user_text).lemmas
+    errors = detect_errors_in_tokens(tokens)
+    if not errors:
+        return errors
+    lattice = build_lattice(tokens, errors)
+    path, _ = beam_search(lattice, beam_width)
+    for err in errors:
+        correction = path[err['index']]
+        err['correction'] = correction
+        if correction in err['suggestions']:
+            k = err['suggestions'].index(correction)
+            for key in ('suggestions', 'distances', 'scores'):
+                err[key].insert(0, err[key].pop(k))
+        elif correction != err['word'].lower():
+            err['suggestions'].insert(0, correction)
+            err['distances'].insert(0, edit_distance(err['word'].lower(), correction))
+            err['scores'].insert(0, None)  # chosen by the path score, not the per-token ranking
+    return errors
+
+def correct_sentence(user_text, beam_width=BEAM_WIDTH):
+    """Lemma tokens with every flagged token replaced by the decoder's choice"""
+    tokens = analyze_user_input(user_text).lemmas
+    lattice = build_lattice(tokens)
+    path, _ = beam_search(lattice, beam_width)
+    return [token if choice is None else choice for token, choice in zip(tokens, path)]
+
+# -----------------------------
+# Example usage
+# -----------------------------
+if __name__ == "__main__":
+    test_sentence = "the machne lerning modle is train on larg dataset"
+    for err in detect_errors_sentence(test_sentence):
+        print(f"Word: {err['word']} | Correction: {err['correction']} | Suggestions: {err['suggestions']}")
+    print("Corrected:", " ".join(correct_sentence(test_sentence)))
@@ -0,0 +1,248 @@
+# server.py
+"""
+Local HTTP/JSON correction service (standard library only)
+- POST /detect   {"text": ...}  -> {"errors": [...]}            (detect_errors)
+- POST /display  {"text": ...}  -> {"tokens", "grammar_indices", "grammar_map"}
+- POST /check    {"text": ...}  -> both of the above
+- GET  /health                  -> status, model version, queue and batch counters
+- GET  /metrics                 -> per-stage timers and counters in Prometheus
+                                   text format (with --metrics, see metrics.py)
+- Requests arriving within --max-wait-ms of each other are coalesced into one
+  micro-batch (at most --max-batch texts) and processed by a single worker
+  thread, while handler threads only parse JSON and wait. This is request
+  coalescing only: identical texts in a batch are analysed once, every other
+  text still goes through tagging and candidate search on its own (the batch
+  just reuses the process-wide candidate and suggestion caches)
+- Models, indexes and the tagger are warmed up before the port is opened
+
+Usage:
+    python server.py --port 8080 --max-batch 32 --max-wait-ms 5
+    python loadgen.py --url http://127.0.0.1:8080 --clients 16
+    python prefork.py --workers 4 --port 8080   # several processes sharing one model load
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+from corrections import MODELS, detect_errors, display_tokens, warmup
+from user_preprocess import analyze_user_input
+
+MAX_BATCH = 32
+MAX_WAIT = 0.005         # seconds to wait for more requests after the first one
+MAX_TEXT_CHARS = 100000  # larger request bodies are rejected
+REQUEST_TIMEOUT = 30.0
+
+# -----------------------------
+# Request handlers (run on the batch thread)
+# -----------------------------
+def _display(analysis):
+    tokens, grammar_indices, grammar_map = display_tokens(analysis)
+    return {
+        "tokens": tokens,
+        "grammar_indices": grammar_indices,
+        # JSON objects only have string keys; keep the index as a number
+        "grammar_map": [[i, old, new] for i, (old, new) in sorted(grammar_map.items())],
+    }
+
+def _check(analysis):
+    result = _display(analysis)
+    result["errors"] = detect_errors(analysis)
+    return result
+
+OPERATIONS = {
+    "/detect": lambda analysis: {"errors": detect_errors(analysis)},
+    "/display": _display,
+    "/check": _check,
+}
+
+# -----------------------------
+# Micro-batching
+# -----------------------------
+class MicroBatcher:
+    """
+    Collects (operation, text) requests from many threads and processes them
+    in batches on one worker thread. submit() returns a Future. Batching only
+    de-duplicates identical texts; each distinct text is processed by itself.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, text):
+        future = Future()
+        self._queue.put((operation, text, future))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "largest_batch": self.largest_batch,
+            "mean_batch": self.requests / self.batches if self.batches else 0.0,
+            "queued": self.pending(),
+        }
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or max_wait passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batches += 1
+            self.requests += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self._process(batch)
+
+    def _process(self, batch):
+        analyses = {}  # identical texts in a batch are analysed once
+        for operation, text, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                analysis = analyses.get(text)
+                if analysis is None:
+                    analysis = analyses[text] = analyze_user_input(text)
+                future.set_result(OPERATIONS[operation](analysis))
+            except Exception as exc:
+                future.set_exception(exc)
+
+# -----------------------------
+# HTTP layer
+# -----------------------------
+class CorrectionHandler(BaseHTTPRequestHandler):
+    server_version = "SpellCheck/1.0"
+    protocol_version = "HTTP/1.1"  # keep-alive, so load generators can reuse connections
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/metrics" and metrics.enabled:
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+            return
+        if self.path != "/health":
+            self._send(404, {"error": "not found"})
+            return
+        self._send(200, {
+            "status": "ok",
+            "pid": os.getpid(),
+            "models_loaded": MODELS.loaded,
+            "model_version": MODELS.version,
+            "batching": self.server.batcher.stats(),
+        })
+
+    def do_POST(self):
+        if self.path not in OPERATIONS:
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True  # the body cannot be delimited
+            self._send(400, {"error": "invalid Content-Length"})
+            return
+        if length > 4 * MAX_TEXT_CHARS:
+            self.close_connection = True  # the body is left unread
+            self._send(413, {"error": "request too large"})
+            return
+        try:
+            text = json.loads(self.rfile.read(length) or b"{}")["text"]
+            if not isinstance(text, str) or len(text) > MAX_TEXT_CHARS:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": 'expected a JSON object {"text": "..."}'})
+            return
+
+        future = self.server.batcher.submit(self.path, text)
+        try:
+            self._send(200, future.result(timeout=REQUEST_TIMEOUT))
+        except FutureTimeout:
+            future.cancel()
+            self._send(503, {"error": "timed out"})
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class CorrectionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, max_batch=MAX_BATCH, max_wait=MAX_WAIT, verbose=False, listen_socket=None):
+        """listen_socket: an already bound and listening socket to serve on (see prefork.py)"""
+        super().__init__(address, CorrectionHandler, bind_and_activate=listen_socket is None)
+        if listen_socket is not None:
+            self.socket.close()
+            self.socket = listen_socket
+            self.server_address = listen_socket.getsockname()
+            self.server_name, self.server_port = self.server_address[:2]
+        self.batcher = MicroBatcher(max_batch, max_wait)
+        self.verbose = verbose
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve detect_errors / display_tokens over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="texts per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000,
+                        help="how long a batch waits for more requests")
+    parser.add_argument("--no-warmup", action="store_true", help="load models on the first request")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    parser.add_argument("--metrics", action="store_true", help="record stage metrics and serve /metrics")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+
+    if not args.no_warmup:
+        timings = warmup()
+        print("Warm-up: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in timings.items()))
+
+    server = CorrectionServer((args.host, args.port), args.max_batch, args.max_wait_ms / 1000, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"(max batch {args.max_batch}, max wait {args.max_wait_ms:g} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
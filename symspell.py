@@ -0,0 +1,262 @@
+# symspell.py
+"""
+Symmetric-deletion candidate index (SymSpell style)
+- Precompute every deletion of every vocabulary word up to MAX_DELETES
+- Map each deletion back to the vocabulary words that produce it
+- Lookup: generate deletions of the query, collect the words they point to,
+  then verify with the exact edit distance
+- Lookup cost depends on the query length, not on the vocabulary size
+- FlatSymSpellIndex holds the same postings in flat arrays (sorted crc32 keys,
+  offsets, word ids) in a memory-mapped file: no per-entry Python objects, so
+  forked workers share its pages instead of dirtying them with refcounts
+"""
+
+import hashlib
+import mmap
+import os
+import pickle
+import sys
+import zlib
+from array import array
+from nltk.metrics.distance import edit_distance
+
+import numpy as np
+
+MAX_DELETES = 2
+INDEX_PATH = "symspell_index.pkl"
+FLAT_INDEX_PATH = "symspell_flat.idx"
+FLAT_MAGIC = b"SPELLSYM"
+FLAT_VERSION = 1
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def deletes(word, max_distance):
+    """Return every string reachable from word by up to max_distance deletions (including word)"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for w in frontier:
+            for i in range(len(w)):
+                next_frontier.add(w[:i] + w[i + 1:])
+        next_frontier -= result
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+def vocab_fingerprint(words):
+    """Stable hash of a word collection, used to detect a stale index on disk"""
+    if hasattr(words, "fingerprint"):
+        return words.fingerprint  # lexicons carry the hash of the words they were built from
+    digest = hashlib.sha1()
+    for w in sorted(words):
+        digest.update(w.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+# -----------------------------
+# Index
+# -----------------------------
+class SymSpellIndex:
+    """Deletion index over a fixed vocabulary"""
+
+    def __init__(self, words, max_distance=MAX_DELETES):
+        self.max_distance = max_distance
+        self.fingerprint = vocab_fingerprint(words)
+        self.deletes = {}
+        for word in words:
+            for d in deletes(word, max_distance):
+                self.deletes.setdefault(d, []).append(word)
+
+    def lookup(self, word, max_distance=MAX_DELETES):
+        """Return all indexed words within max_distance (Levenshtein) of word"""
+        return [cand for cand, _ in self.lookup_distances(word, max_distance)]
+
+    def lookup_distances(self, word, max_distance=MAX_DELETES):
+        """lookup() as (word, edit distance) pairs"""
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f"index was built for max_distance={self.max_distance}, got {max_distance}"
+            )
+        seen = set()
+        candidates = []
+        for d in deletes(word, max_distance):
+            for cand in self.deletes.get(d, ()):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                if abs(len(cand) - len(word)) > max_distance:
+                    continue
+                distance = edit_distance(word, cand)
+                if distance <= max_distance:
+                    candidates.append((cand, distance))
+        return candidates
+
+    def save(self, path=INDEX_PATH):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path=INDEX_PATH):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+def load_or_build(words, path=INDEX_PATH, max_distance=MAX_DELETES):
+    """
+    Load the index from disk if it matches words, otherwise build it and
+    write it back so the next start is cheap.
+    """
+    fingerprint = vocab_fingerprint(words)
+    if os.path.exists(path):
+        try:
+            index = SymSpellIndex.load(path)
+            if index.fingerprint == fingerprint and index.max_distance >= max_distance:
+                return index
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    index = SymSpellIndex(words, max_distance)
+    try:
+        index.save(path)
+    except OSError:
+        pass  # read-only deployment: keep the in-memory index
+    return index
+
+# -----------------------------
+# Flat index
+# -----------------------------
+def compile_flat(words, max_distance=MAX_DELETES):
+    """Flat index bytes: crc32 of each deletion (sorted) -> range of word ids"""
+    from model_bundle import build_word_table, pack
+
+    words = sorted(set(words))
+    postings = {}
+    for i, word in enumerate(words):
+        for d in deletes(word, max_distance):
+            postings.setdefault(zlib.crc32(d.encode("utf-8")), []).append(i)
+    keys = array("I", sorted(postings))
+    offsets = array("I", [0])
+    ids = array("I")
+    for key in keys:
+        ids.extend(postings[key])  # crc32 collisions just merge postings; lookup verifies
+        offsets.append(len(ids))
+    word_blob, word_offsets, _ = build_word_table(words)
+    meta = {
+        "byteorder": sys.byteorder,
+        "max_distance": max_distance,
+        "fingerprint": vocab_fingerprint(words),
+        "n_words": len(words),
+    }
+    sections = {
+        "keys": (keys, "I"),
+        "offsets": (offsets, "I"),
+        "ids": (ids, "I"),
+        "words": (word_blob, "B"),
+        "word_offsets": (word_offsets, "I"),
+        "lengths": (array("I", (len(w) for w in words)), "I"),
+    }
+    return pack(FLAT_MAGIC, FLAT_VERSION, meta, sections)
+
+class FlatSymSpellIndex:
+    """SymSpellIndex over flat arrays in a buffer (an mmap, or bytes)"""
+
+    def __init__(self, buffer):
+        from model_bundle import section, unpack_meta
+
+        self.meta = unpack_meta(buffer, FLAT_MAGIC, FLAT_VERSION)
+        self.path = None  # set by open()
+        self._buffer = buffer
+        view = memoryview(buffer)
+        self.max_distance = self.meta["max_distance"]
+        self.fingerprint = self.meta["fingerprint"]
+        self._keys = np.frombuffer(section(view, self.meta, "keys"), dtype=np.uint32)
+        self._offsets = np.frombuffer(section(view, self.meta, "offsets"), dtype=np.uint32)
+        self._ids = np.frombuffer(section(view, self.meta, "ids"), dtype=np.uint32)
+        self._lengths = np.frombuffer(section(view, self.meta, "lengths"), dtype=np.uint32)
+        self._words = section(view, self.meta, "words")
+        self._word_offsets = section(view, self.meta, "word_offsets")
+
+    @classmethod
+    def open(cls, path=FLAT_INDEX_PATH):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = cls(mm)
+        index.path = path
+        return index
+
+    def source(self):
+        """What another process needs to reopen this index: its file path, or its bytes"""
+        return self.path or bytes(self._buffer)
+
+    def _word(self, i):
+        return bytes(self._words[self._word_offsets[i]:self._word_offsets[i + 1]]).decode("utf-8")
+
+    def lookup(self, word, max_distance=MAX_DELETES):
+        """Return all indexed words within max_distance (Levenshtein) of word"""
+        return [cand for cand, _ in self.lookup_distances(word, max_distance)]
+
+    def lookup_distances(self, word, max_distance=MAX_DELETES):
+        """lookup() as (word, edit distance) pairs, in vocabulary order"""
+        if max_distance > self.max_distance:
+            raise ValueError(
+                f"index was built for max_distance={self.max_distance}, got {max_distance}"
+            )
+        dels = deletes(word, max_distance)
+        hashes = np.fromiter((zlib.crc32(d.encode("utf-8")) for d in dels), dtype=np.uint32, count=len(dels))
+        pos = np.searchsorted(self._keys, hashes)
+        inside = pos < len(self._keys)
+        pos = pos[inside]
+        pos = pos[self._keys[pos] == hashes[inside]]
+        if len(pos) == 0:
+            return []
+        # Gather every matching posting list in one indexing operation
+        starts = self._offsets[pos].astype(np.int64)
+        lengths = self._offsets[pos + 1] - starts
+        ends = np.cumsum(lengths)
+        gather = np.arange(ends[-1]) + np.repeat(starts - (ends - lengths), lengths)
+        ids = np.unique(self._ids[gather])
+        ids = ids[np.abs(self._lengths[ids].astype(np.int64) - len(word)) <= max_distance]
+        candidates = []
+        for i in ids.tolist():
+            cand = self._word(i)
+            distance = edit_distance(word, cand)
+            if distance <= max_distance:
+                candidates.append((cand, distance))
+        return candidates
+
+def load_or_build_flat(words, path=FLAT_INDEX_PATH, max_distance=MAX_DELETES):
+    """Map the flat index if it matches words, otherwise compile it (bytes if it cannot be written)"""
+    from model_bundle import write_atomic
+
+    fingerprint = vocab_fingerprint(words)
+    if os.path.exists(path):
+        try:
+            index = FlatSymSpellIndex.open(path)
+            if index.fingerprint == fingerprint and index.max_distance >= max_distance:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    data = compile_flat(words, max_distance)
+    try:
+        write_atomic(path, data)
+        return FlatSymSpellIndex.open(path)
+    except OSError:
+        return FlatSymSpellIndex(data)
+
+# -----------------------------
+# Build from the corpus vocabulary
+# -----------------------------
+if __name__ == "__main__":
+    from user_preprocess import FUNCTION_WORDS
+
+    with open("vocabulary.txt", "r", encoding="utf-8") as f:
+        vocab = set(w.lower() for w in f.read().splitlines()) | FUNCTION_WORDS
+
+    index = SymSpellIndex(vocab)
+    index.save()
+    print(f"SymSpell index built. Words: {len(vocab)} | Deletion keys: {len(index.deletes)}")
+
+    data = compile_flat(vocab)
+    with open(FLAT_INDEX_PATH, "wb") as f:
+        f.write(data)
+    print(f"Flat index written to {FLAT_INDEX_PATH} ({len(data) / 1024:.0f} KiB)")
@@ -5,63 +5,144 @@ Stage 2: Tokenization & Lemmatization (for corpus)
 - Remove punctuation and numbers
 - Preserve auxiliary verbs for context
 - Lemmatize content verbs using WordNet
+
+Usage:
+    python tokenize_text.py                 # single pass over the whole text
+    python tokenize_text.py --workers 8     # sentence-aligned shards in a process pool
+
+Sharded mode cuts cleaned.txt into shards of about --shard-chars characters,
+each ending at a sentence boundary, tags and lemmatizes them in parallel and
+writes them back in shard order. The shard boundaries depend only on
+--shard-chars, so the output is the same for any number of workers (it can
+differ slightly from the single pass, where the tagger also sees context
+across sentence boundaries).
 """
 
+import argparse
 import re
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
-from nltk import pos_tag
+from nltk.tag import PerceptronTagger
+
+SHARD_CHARS = 1 << 20
+SENTENCE_END = re.compile(r'[.!?]\s')
 
-# Download NLTK resources (run once)
-nltk.download("punkt")
-nltk.download("wordnet")
-nltk.download("omw-1.4")
-nltk.download("stopwords")
-nltk.download("averaged_perceptron_tagger")
+# Auxiliary verbs to preserve
+AUX_VERBS = {"am", "is", "are", "was", "were"}
+KEEP = {"is", "was", "are", "this", "that"}  # preserve for context
 
 lemmatizer = WordNetLemmatizer()
+_tagger = None
+_stopwords = None
 
-# Stopwords
-STOPWORDS = set(stopwords.words("english"))
-KEEP = {"is", "was", "are", "this", "that"}  # preserve for context
-STOPWORDS = STOPWORDS - KEEP
+def init_worker():
+    """Load the tagger and stopword list once per process"""
+    global _tagger, _stopwords
+    _tagger = PerceptronTagger()
+    _stopwords = set(stopwords.words("english")) - KEEP
 
-# Auxiliary verbs to preserve
-AUX_VERBS = {"am", "is", "are", "was", "were"}
+@lru_cache(maxsize=None)
+def lemmatize(word, verb):
+    """WordNet lemma, memoized (the corpus repeats the same words constantly)"""
+    if verb:
+        return lemmatizer.lemmatize(word, pos="v")
+    return lemmatizer.lemmatize(word)
+
+# -----------------------------
+# Shards
+# -----------------------------
+def iter_shards(f, shard_chars=SHARD_CHARS):
+    """Yield consecutive pieces of f of about shard_chars, cut after a sentence end"""
+    carry = ""
+    while True:
+        block = f.read(shard_chars)
+        buf = carry + block
+        if not block:
+            if buf:
+                yield buf
+            return
+        cut = 0
+        for m in SENTENCE_END.finditer(buf, max(0, len(buf) - shard_chars)):
+            cut = m.end()
+        if cut == 0:
+            # No sentence end in the window: cut at whitespace so no word is split
+            cut = buf.rfind(" ") + 1
+        if cut == 0:
+            carry = buf
+            continue
+        yield buf[:cut]
+        carry = buf[cut:]
+
+def process_text(text):
+    """Tokenize, tag, drop stopwords and lemmatize one piece of text"""
+    # Tokenize: only alphabetic words
+    tokens = re.findall(r'\b[a-z]+\b', text)
+
+    # POS tagging
+    tagged_tokens = _tagger.tag(tokens)
+
+    processed_tokens = []
+    for word, tag in tagged_tokens:
+        # Skip stopwords (except AUX_VERBS and KEEP)
+        if word in _stopwords:
+            continue
 
-# Read cleaned text
-with open("cleaned.txt", "r", encoding="utf-8") as f:
-    text = f.read()
+        # Preserve auxiliary verbs as-is
+        if word in AUX_VERBS:
+            lemma = word
+        # Lemmatize content verbs / other words
+        else:
+            lemma = lemmatize(word, tag.startswith("V"))
 
-# Tokenize: only alphabetic words
-tokens = re.findall(r'\b[a-z]+\b', text)
+        processed_tokens.append(lemma)
+    return processed_tokens
 
-# POS tagging
-tagged_tokens = pos_tag(tokens)
+# -----------------------------
+# Main
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage 2: tokenize, tag and lemmatize cleaned.txt")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="process pool size for sharded mode (0 = single pass)")
+    parser.add_argument("--shard-chars", type=int, default=SHARD_CHARS,
+                        help="approximate shard size in characters")
+    args = parser.parse_args(argv)
 
-processed_tokens = []
+    # Download NLTK resources (run once)
+    nltk.download("punkt")
+    nltk.download("wordnet")
+    nltk.download("omw-1.4")
+    nltk.download("stopwords")
+    nltk.download("averaged_perceptron_tagger")
 
-for word, tag in tagged_tokens:
-    # Skip stopwords (except AUX_VERBS and KEEP)
-    if word in STOPWORDS:
-        continue
+    start = time.perf_counter()
+    total = 0
+    with open("cleaned.txt", "r", encoding="utf-8") as src, \
+            open("tokens.txt", "w", encoding="utf-8") as dst:
+        if args.workers <= 0:
+            init_worker()
+            shards = [process_text(src.read())]
+        else:
+            pool = Pool(args.workers, initializer=init_worker)
+            shards = pool.imap(process_text, iter_shards(src, args.shard_chars))
 
-    # Preserve auxiliary verbs as-is
-    if word in AUX_VERBS:
-        lemma = word
-    # Lemmatize content verbs
-    elif tag.startswith("V"):
-        lemma = lemmatizer.lemmatize(word, pos="v")
-    # Lemmatize other words
-    else:
-        lemma = lemmatizer.lemmatize(word)
+        # Save tokens for vocabulary & bigram building (in shard order)
+        for tokens in shards:
+            for token in tokens:
+                dst.write(token + "\n")
+            total += len(tokens)
 
-    processed_tokens.append(lemma)
+        if args.workers > 0:
+            pool.close()
+            pool.join()
 
-# Save tokens for vocabulary & bigram building
-with open("tokens.txt", "w", encoding="utf-8") as f:
-    for token in processed_tokens:
-        f.write(token + "\n")
+    elapsed = time.perf_counter() - start
+    print(f"Stage 2: Tokenization complete. Total tokens: {total} ({elapsed:.1f}s)")
 
-print(f"Stage 2: Tokenization complete. Total tokens: {len(processed_tokens)}")
+if __name__ == "__main__":
+    main()
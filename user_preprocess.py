@@ -166,7 +166,8 @@ Grammar-aware preprocessing for user input
 import re
 import nltk
 from nltk.stem import WordNetLemmatizer
-from nltk import pos_tag
+from nltk.tag import PerceptronTagger
+import metrics
 from POS import to_present_participle, to_past_participle, BE_VERBS, HAS_VERBS
 
 # -----------------------------
@@ -185,6 +186,17 @@ for pkg, path in [
 
 lemmatizer = WordNetLemmatizer()
 
+# nltk.pos_tag builds a new PerceptronTagger (reading its model from disk) on
+# every call; keep one per process instead
+_tagger = None
+
+def get_tagger():
+    """Perceptron tagger used by nltk.pos_tag, loaded once"""
+    global _tagger
+    if _tagger is None:
+        _tagger = PerceptronTagger()
+    return _tagger
+
 # Function words: never flagged as errors
 FUNCTION_WORDS = {
     "this","that","which","who","whom","whose",
@@ -198,14 +210,20 @@ FUNCTION_WORDS = {
 # -----------------------------
 # Preprocessing for detection
 # -----------------------------
-def preprocess_user_input(text):
-    """
-    Lemmatize tokens for spelling detection.
-    """
-    text = text.lower()
-    tokens = re.findall(r'\b[a-z]+\b', text)
-    tagged_tokens = pos_tag(tokens)
+# Matched on the original text and lowercased per token: lowercasing the
+# whole text first can change its length ('İ' -> 'i̇') and shift every span
+TOKEN_PATTERN = re.compile(r'\b[a-zA-Z]+\b')
+
+def tokenize_user_input(text):
+    """Split into alphabetic tokens, lowercased"""
+    return [token.lower() for token in TOKEN_PATTERN.findall(text)]
 
+def token_spans(text):
+    """(start, end) character spans in text of the tokens returned by tokenize_user_input"""
+    return [m.span() for m in TOKEN_PATTERN.finditer(text)]
+
+def lemmatize_tagged(tagged_tokens):
+    """Lemmatize (word, tag) pairs, keeping BE/HAS auxiliaries as-is"""
     processed = []
     for word, tag in tagged_tokens:
         if word in BE_VERBS | HAS_VERBS:
@@ -215,9 +233,32 @@ def preprocess_user_input(text):
         else:
             lemma = lemmatizer.lemmatize(word)
         processed.append(lemma)
-
     return processed
 
+def _tag_and_lemmatize(text):
+    """(tokens, tagged tokens, lemmas) of text, timed per stage when metrics are enabled"""
+    with metrics.timer("tokenize"):
+        tokens = tokenize_user_input(text)
+    with metrics.timer("tag"):
+        tagged_tokens = get_tagger().tag(tokens)
+    with metrics.timer("lemmatize"):
+        lemmas = lemmatize_tagged(tagged_tokens)
+    metrics.count("tokens", len(tokens))
+    return tokens, tagged_tokens, lemmas
+
+def preprocess_user_input(text):
+    """
+    Lemmatize tokens for spelling detection.
+    """
+    return _tag_and_lemmatize(text)[2]
+
+def preprocess_user_inputs(texts):
+    """
+    Batch version of preprocess_user_input (same results as tagging each
+    text separately, as nltk.pos_tag_sents does).
+    """
+    return [_tag_and_lemmatize(text)[2] for text in texts]
+
 # -----------------------------
 # Grammar correction for display
 # -----------------------------
@@ -281,6 +322,31 @@ def apply_display_grammar(tokens):
 
     return display_tokens, grammar_indices, grammar_map
 
+# -----------------------------
+# Shared single-pass analysis
+# -----------------------------
+class TextAnalysis:
+    """
+    Tokens, POS tags, lemmas and display grammar of one text, computed once.
+    detect_errors and display_tokens both accept it, so a check tags the text
+    a single time.
+    """
+
+    __slots__ = ("text", "tokens", "tags", "lemmas",
+                 "display_tokens", "grammar_indices", "grammar_map")
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens, tagged_tokens, self.lemmas = _tag_and_lemmatize(text)
+        self.tags = [tag for _, tag in tagged_tokens]
+        self.display_tokens, self.grammar_indices, self.grammar_map = apply_display_grammar(self.lemmas)
+
+def analyze_user_input(text):
+    """TextAnalysis for text (an existing TextAnalysis is returned unchanged)"""
+    if isinstance(text, TextAnalysis):
+        return text
+    return TextAnalysis(text)
+
 # -----------------------------
 # Module test (only runs if executed directly)
 # -----------------------------